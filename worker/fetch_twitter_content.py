@@ -11,15 +11,22 @@ Twitter/X Content Fetcher
 """
 
 import argparse
+import asyncio
 import json
 import os
+import random
 import re
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+import httpx
 import requests
+from urllib3.util.retry import Retry
 
 # 加载环境变量
 try:
@@ -177,25 +184,140 @@ def fetch_author_replies(tweet_id: str, author_username: str) -> list:
 
 
 
+# 支持 twitter.com 和 x.com，模块加载时编译一次
+TWEET_URL_RE = re.compile(r'(?:twitter\.com|x\.com)/(\w+)/status/(\d+)')
+
+
 def extract_tweet_id(url: str) -> str:
     """从 URL 中提取推文 ID"""
-    # 支持 twitter.com 和 x.com
-    pattern = r'(?:twitter\.com|x\.com)/\w+/status/(\d+)'
-    match = re.search(pattern, url)
+    match = TWEET_URL_RE.search(url)
     if match:
-        return match.group(1)
+        return match.group(2)
     raise ValueError(f"无法从 URL 中提取推文 ID: {url}")
 
 
 def extract_username(url: str) -> str:
     """从 URL 中提取用户名"""
-    pattern = r'(?:twitter\.com|x\.com)/(\w+)/status/\d+'
-    match = re.search(pattern, url)
+    match = TWEET_URL_RE.search(url)
     if match:
         return match.group(1)
     raise ValueError(f"无法从 URL 中提取用户名: {url}")
 
 
+# 推文 API 请求限速: 令牌桶速率 (请求/秒) 和突发容量，导入脚本多线程并发调用 fetch_tweet 时共享
+TWEET_API_RATE = float(os.environ.get("TWEET_API_RATE", "1"))
+TWEET_API_BURST = 4
+
+# 429/5xx 时的指数退避: 最多尝试次数和最大等待秒数
+TWEET_API_MAX_ATTEMPTS = 5
+TWEET_API_MAX_BACKOFF = 60
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self) -> float:
+        """尝试取一个令牌，成功返回 0，否则返回需要等待的秒数"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """获取一个令牌，不足时阻塞等待"""
+        while (wait := self._take()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """协程中获取一个令牌，不足时 asyncio.sleep 等待，不占用线程"""
+        while (wait := self._take()) > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, seconds: float):
+        """服务端要求等待时清空令牌，让其它线程也一起暂停"""
+        with self.lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+TWEET_API_BUCKET = TokenBucket(TWEET_API_RATE, TWEET_API_BURST)
+
+# 共享 Session 的连接池: 缓存的主机数和每个主机的连接数 (不小于导入脚本的线程池大小)
+SESSION_POOL_CONNECTIONS = 16
+SESSION_POOL_MAXSIZE = 32
+
+# 连接/读取错误的自动重试 (429/5xx 由 _get_with_backoff 处理，这里不按状态码重试)
+SESSION_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=(), allowed_methods=frozenset({"GET"}))
+
+_session: requests.Session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    获取模块共享的 requests.Session
+    复用 TCP/TLS 连接，避免每次请求都重新握手
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers["Accept-Encoding"] = "gzip, deflate"
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=SESSION_POOL_CONNECTIONS,
+                    pool_maxsize=SESSION_POOL_MAXSIZE,
+                    max_retries=SESSION_RETRY,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _retry_after_seconds(response: requests.Response) -> float:
+    """从响应头读取需要等待的秒数 (Retry-After / x-rate-limit-reset)，没有则返回 0"""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    reset = response.headers.get("x-rate-limit-reset")
+    if reset and reset.isdigit():
+        return max(0.0, int(reset) - time.time())
+    return 0.0
+
+
+def _get_with_backoff(url: str, headers: dict) -> requests.Response:
+    """
+    限速的 GET 请求，429/5xx 时按指数退避 (full jitter) 重试
+    """
+    for attempt in range(TWEET_API_MAX_ATTEMPTS):
+        TWEET_API_BUCKET.acquire()
+        response = get_session().get(url, headers=headers, timeout=30)
+        if response.status_code != 429 and response.status_code < 500:
+            return response
+        if attempt == TWEET_API_MAX_ATTEMPTS - 1:
+            break
+
+        delay = random.uniform(0, min(TWEET_API_MAX_BACKOFF, 2 ** attempt))
+        server_delay = min(_retry_after_seconds(response), TWEET_API_MAX_BACKOFF)
+        if server_delay:
+            delay = max(delay, server_delay)
+            TWEET_API_BUCKET.penalize(server_delay)
+        print(f"   ⏳ HTTP {response.status_code}，{delay:.1f}s 后重试 ({attempt + 1}/{TWEET_API_MAX_ATTEMPTS - 1})")
+        time.sleep(delay)
+    return response
+
+
 def fetch_with_syndication_api(tweet_id: str) -> dict:
     """
     使用 Twitter Syndication API 获取推文内容
@@ -208,7 +330,7 @@ def fetch_with_syndication_api(tweet_id: str) -> dict:
         'Accept': 'application/json',
     }
     
-    response = requests.get(url, headers=headers, timeout=30)
+    response = _get_with_backoff(url, headers)
     
     if response.status_code == 200:
         return response.json()
@@ -228,7 +350,7 @@ def fetch_with_fxtwitter(tweet_id: str, username: str) -> dict:
         'Accept': 'application/json',
     }
     
-    response = requests.get(url, headers=headers, timeout=30)
+    response = _get_with_backoff(url, headers)
     
     if response.status_code == 200:
         return response.json()
@@ -236,6 +358,25 @@ def fetch_with_fxtwitter(tweet_id: str, username: str) -> dict:
         raise Exception(f"FxTwitter API 请求失败: {response.status_code}")
 
 
+async def fetch_with_fxtwitter_async(client: httpx.AsyncClient, tweet_id: str, username: str) -> dict:
+    """
+    fetch_with_fxtwitter 的异步版本，复用调用方传入的 httpx.AsyncClient 连接池
+    """
+    url = f"https://api.fxtwitter.com/{username}/status/{tweet_id}"
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (compatible; TwitterBot/1.0)',
+        'Accept': 'application/json',
+    }
+
+    response = await client.get(url, headers=headers, timeout=30)
+
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"FxTwitter API 请求失败: {response.status_code}")
+
+
 def fetch_with_vxtwitter(tweet_id: str, username: str) -> dict:
     """
     使用 VxTwitter API 获取推文内容
@@ -247,7 +388,7 @@ def fetch_with_vxtwitter(tweet_id: str, username: str) -> dict:
         'Accept': 'application/json',
     }
     
-    response = requests.get(url, headers=headers, timeout=30)
+    response = _get_with_backoff(url, headers)
     
     if response.status_code == 200:
         return response.json()
@@ -255,6 +396,37 @@ def fetch_with_vxtwitter(tweet_id: str, username: str) -> dict:
         raise Exception(f"VxTwitter API 请求失败: {response.status_code}")
 
 
+async def fetch_with_vxtwitter_async(client: httpx.AsyncClient, tweet_id: str, username: str) -> dict:
+    """
+    fetch_with_vxtwitter 的异步版本，复用调用方传入的 httpx.AsyncClient 连接池
+    """
+    url = f"https://api.vxtwitter.com/{username}/status/{tweet_id}"
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (compatible; TwitterBot/1.0)',
+        'Accept': 'application/json',
+    }
+
+    response = await client.get(url, headers=headers, timeout=30)
+
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"VxTwitter API 请求失败: {response.status_code}")
+
+
+# Playwright 只需要 DOM，拦截这些资源以减少页面体积
+PLAYWRIGHT_BLOCKED_RESOURCES = frozenset({"image", "media", "font", "stylesheet"})
+
+
+def _block_heavy_resources(route):
+    """Playwright 路由: 拦截图片/媒体/字体/样式表请求"""
+    if route.request.resource_type in PLAYWRIGHT_BLOCKED_RESOURCES:
+        route.abort()
+    else:
+        route.continue_()
+
+
 def fetch_with_playwright(url: str) -> dict:
     """
     使用 Playwright 浏览器自动化获取推文内容
@@ -270,11 +442,17 @@ def fetch_with_playwright(url: str) -> dict:
         context = browser.new_context(
             user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         )
+        context.route("**/*", _block_heavy_resources)
         page = context.new_page()
         
         try:
-            page.goto(url, wait_until='networkidle', timeout=30000)
-            page.wait_for_timeout(3000)  # 等待页面完全加载
+            # 只等 DOM 就绪，再等待推文文本出现，不再等待 networkidle + 固定 3 秒
+            page.goto(url, wait_until='domcontentloaded', timeout=30000)
+            try:
+                page.wait_for_selector('article [data-testid="tweetText"], article div[lang]', timeout=15000)
+                page.wait_for_selector('[data-testid="tweetPhoto"] img', timeout=3000)
+            except Exception:
+                pass  # 超时后仍尝试提取已渲染的内容
             
             # 获取推文文本
             tweet_text_selectors = [
@@ -318,21 +496,38 @@ def fetch_with_playwright(url: str) -> dict:
     return result
 
 
+# 图片并发下载: 所有 fetch_tweet 调用共享同一线程池，总并发数不超过 IMAGE_DOWNLOAD_WORKERS
+IMAGE_DOWNLOAD_WORKERS = 8
+
+_image_executor: ThreadPoolExecutor = None
+
+
+def get_image_executor() -> ThreadPoolExecutor:
+    """获取共享的图片下载线程池"""
+    global _image_executor
+    if _image_executor is None:
+        with _session_lock:
+            if _image_executor is None:
+                _image_executor = ThreadPoolExecutor(
+                    max_workers=IMAGE_DOWNLOAD_WORKERS, thread_name_prefix="image"
+                )
+    return _image_executor
+
+
 def download_image(url: str, save_path: str) -> str:
     """下载图片到本地"""
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
     }
     
-    response = requests.get(url, headers=headers, timeout=30, stream=True)
-    
-    if response.status_code == 200:
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        return save_path
-    else:
-        raise Exception(f"图片下载失败: {response.status_code}")
+    with get_session().get(url, headers=headers, timeout=30, stream=True) as response:
+        if response.status_code == 200:
+            with open(save_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+            return save_path
+        else:
+            raise Exception(f"图片下载失败: {response.status_code}")
 
 
 def parse_syndication_result(data: dict) -> dict:
@@ -605,6 +800,8 @@ def fetch_tweet(url: str, download_images: bool = True, output_dir: str = ".",
         os.makedirs(output_dir, exist_ok=True)
         downloaded_images = []
         
+        # 所有图片并发下载，按原顺序收集结果
+        futures = []
         for i, img_url in enumerate(result["images"]):
             # 获取高清版本
             if "?" in img_url:
@@ -614,10 +811,11 @@ def fetch_tweet(url: str, download_images: bool = True, output_dir: str = ".",
             
             filename = f"tweet_{tweet_id}_image_{i+1}.jpg"
             filepath = os.path.join(output_dir, filename)
-            
+            futures.append((filename, get_image_executor().submit(download_image, high_res_url, filepath)))
+        
+        for i, (filename, future) in enumerate(futures):
             try:
-                download_image(high_res_url, filepath)
-                downloaded_images.append(filepath)
+                downloaded_images.append(future.result())
                 print(f"      ✓ 图片 {i+1}: {filename}")
             except Exception as e:
                 print(f"      ✗ 图片 {i+1} 下载失败: {e}")
@@ -33,10 +33,16 @@ X/Twitter AI Art Account Monitor
     X_USERNAME          - X 账号用户名 (备用登录方式)
     X_EMAIL             - X 账号邮箱
     X_PASSWORD          - X 账号密码
+    REDIS_URL           - Redis 连接 (可选): 缓存 FxTwitter/VxTwitter 响应 24 小时，
+                          并用 SET 记录已处理的推文 ID (替代状态文件)
 """
 
 import argparse
 import asyncio
+import contextlib
+import functools
+import importlib.util
+import itertools
 import json
 import os
 import random
@@ -44,6 +50,7 @@ import re
 import sys
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -73,6 +80,7 @@ except ImportError:
     print("[Warning] twikit not installed. Run: pip install twikit")
 
 # HTTP 请求
+import httpx
 import requests
 try:
     from bs4 import BeautifulSoup
@@ -80,13 +88,30 @@ try:
 except ImportError:
     HAS_BS4 = False
 
+# HTTP/2 需要 h2 (pip install "httpx[http2]")，只检查是否安装，不需要导入
+HAS_H2 = importlib.util.find_spec("h2") is not None
+
+# aiolimiter (可选，全局令牌桶限速)
+try:
+    from aiolimiter import AsyncLimiter
+    HAS_AIOLIMITER = True
+except ImportError:
+    HAS_AIOLIMITER = False
+
+# Redis (可选，用于缓存 FxTwitter/VxTwitter 响应)
+try:
+    import redis.asyncio as aioredis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
 # 导入 AI 处理函数 (统一使用 prompt_utils)
 from prompt_utils import DEFAULT_MODEL, process_tweet_for_import
 
 # 导入 Twitter API 函数
 from fetch_twitter_content import (
-    fetch_with_fxtwitter,
-    fetch_with_vxtwitter,
+    fetch_with_fxtwitter_async,
+    fetch_with_vxtwitter_async,
     parse_fxtwitter_result,
     parse_vxtwitter_result,
 )
@@ -116,6 +141,12 @@ COOKIES_FILE = Path(__file__).parent / "x_cookies.json"
 # 代理配置 (如果需要)
 PROXY_URL = os.environ.get("X_PROXY", "")
 
+# Redis 缓存 (推文发布后内容基本不变，缓存 24 小时)
+REDIS_URL = os.environ.get("REDIS_URL", "")
+FX_CACHE_TTL = 86400
+REDIS_PROCESSED_KEY = "processed:tweets"
+REDIS_LAST_CHECK_KEY = "last_check"
+
 # 状态文件 (记录已处理的推文 ID)
 STATE_FILE = Path(__file__).parent / "x_monitor_state.json"
 
@@ -126,11 +157,121 @@ STATE_FILE = Path(__file__).parent / "x_monitor_state.json"
 DELAY_BETWEEN_TWEETS = (2, 5)       # 处理每条推文后的随机延迟
 DELAY_BETWEEN_ACCOUNTS = (5, 10)    # 切换账号时的随机延迟
 DELAY_ON_RATE_LIMIT = 60            # 遇到限流时的基础等待时间
+MAX_DELAY_ON_RATE_LIMIT = 600       # 不知道重置时间时的退避上限
 MAX_RETRIES_ON_RATE_LIMIT = 3       # 限流重试次数
 DELAY_BETWEEN_API_CALLS = (1, 3)    # API 调用间隔
+ACCOUNT_CONCURRENCY = 3             # 同时检查的账号数
+MAX_TWEET_IMAGES = 4                # 单条推文最多 4 张图片
+SYNDICATION_CONCURRENCY = 4         # 备用方案中同时获取推文详情的请求数
+# twikit 调用的全局令牌桶: 每个账号调用 UserByScreenName + UserTweets 各一次，
+# UserTweets 上限 50 次/15 分钟，留出余量后按 45 个账号 (90 次调用) / 15 分钟限速
+X_RATE_LIMIT = (90, 900)            # (次数, 秒)
+TWEET_WORKERS = 4                   # 同时处理推文 (AI 提取) 的 worker 数
+TWEET_QUEUE_SIZE = 32               # 抓取与处理之间的队列长度
+
+# ========== 共享 HTTP 客户端 ==========
+# FxTwitter/VxTwitter/Syndication 备用路径复用同一个连接池，避免每次请求重新握手
+
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+HTTP_TIMEOUT = 30.0
+KEEPALIVE_INTERVAL = 75              # 持续模式下保活请求间隔 (秒)
+KEEPALIVE_URL = "https://api.fxtwitter.com/"
+
+_HTTP: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的 httpx.AsyncClient (按需创建)"""
+    global _HTTP
+    if _HTTP is None or _HTTP.is_closed:
+        _HTTP = httpx.AsyncClient(
+            http2=HAS_H2,
+            limits=HTTP_LIMITS,
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
+        )
+    return _HTTP
+
+
+async def close_http_client():
+    """关闭共享的 httpx.AsyncClient"""
+    global _HTTP
+    if _HTTP is not None and not _HTTP.is_closed:
+        await _HTTP.aclose()
+    _HTTP = None
+
+
+async def keep_http_warm():
+    """定期发送轻量 HEAD 请求，避免两次检查之间连接池中的连接因空闲被远端关闭"""
+    while True:
+        await asyncio.sleep(KEEPALIVE_INTERVAL)
+        try:
+            await get_http_client().head(KEEPALIVE_URL, timeout=5)
+        except Exception:
+            pass
+
+
+# 并发检查账号时共享的 twikit 限速器 (未安装 aiolimiter 时不限速)
+X_LIMITER = AsyncLimiter(*X_RATE_LIMIT) if HAS_AIOLIMITER else None
+
+
+def x_rate_limit():
+    """twikit 请求的限速上下文"""
+    return X_LIMITER if X_LIMITER is not None else contextlib.nullcontext()
+
+
+# ========== Redis 响应缓存 ==========
+
+_REDIS = None
+
+
+def get_redis():
+    """获取共享的 Redis 客户端 (未安装 redis 或未配置 REDIS_URL 时返回 None)"""
+    global _REDIS
+    if _REDIS is None and HAS_REDIS and REDIS_URL:
+        _REDIS = aioredis.Redis.from_url(REDIS_URL)
+    return _REDIS
+
+
+async def close_redis():
+    """关闭共享的 Redis 客户端"""
+    global _REDIS
+    if _REDIS is not None:
+        await _REDIS.aclose()
+    _REDIS = None
+
+
+async def fetch_api_cached(prefix: str, fetcher, tweet_id: str, username: str) -> dict:
+    """带 Redis 缓存的 FxTwitter/VxTwitter 请求
+
+    缓存键为 {prefix}:{tweet_id}；Redis 不可用或出错时直接请求上游。
+    """
+    r = get_redis()
+    key = f"{prefix}:{tweet_id}"
+
+    if r is not None:
+        try:
+            cached = await r.get(key)
+            if cached:
+                return json.loads(cached)
+        except Exception as e:
+            print(f"   [Redis] Get failed: {e}")
+
+    data = await fetcher(get_http_client(), tweet_id, username)
+
+    if r is not None:
+        try:
+            await r.setex(key, FX_CACHE_TTL, json.dumps(data, ensure_ascii=False))
+        except Exception as e:
+            print(f"   [Redis] Set failed: {e}")
+
+    return data
+
 
 # 默认监听的 AI 艺术账号 (基于数据库高频统计 + twitterhot.vercel.app)
-DEFAULT_ACCOUNTS = [
+# dict.fromkeys 保持顺序的同时去掉重复导入的账号
+DEFAULT_ACCOUNTS = tuple(dict.fromkeys([
     # Top 20 高频账号 (从数据库统计)
     "songguoxiansen",    # #1 - 144 prompts
     "Gdgtify",           # #2 - 123 prompts
@@ -426,7 +567,10 @@ DEFAULT_ACCOUNTS = [
     "youraipulse",
     "yuanzhe68949664",
     "yyyole",
-]
+]))
+
+# 默认账号集合 (小写，O(1) 且忽略大小写的成员判断)
+_DEFAULT_ACCOUNTS_LOWER = frozenset(a.lower() for a in DEFAULT_ACCOUNTS)
 
 
 # ========== 数据库操作 ==========
@@ -517,13 +661,47 @@ def save_state(state: Dict):
         json.dump(state, f, indent=2)
 
 
-def is_tweet_processed(state: Dict, tweet_id: str) -> bool:
-    """检查推文是否已处理"""
+async def migrate_state_to_redis(state: Dict):
+    """一次性把状态文件中的已处理推文 ID 导入 Redis SET"""
+    r = get_redis()
+    if r is None or state.get("redis_migrated"):
+        return
+
+    ids = state.get("processed_tweets", [])
+    try:
+        if ids:
+            await r.sadd(REDIS_PROCESSED_KEY, *ids)
+        print(f"[Redis] Migrated {len(ids)} processed tweet IDs")
+    except Exception as e:
+        print(f"[Redis] Migration failed: {e}")
+        return
+
+    # 保留 JSON 中的记录，Redis 不可用时仍可回退
+    state["redis_migrated"] = True
+    save_state(state)
+
+
+async def is_tweet_processed(state: Dict, tweet_id: str) -> bool:
+    """检查推文是否已处理 (优先 Redis SET，否则查状态文件)"""
+    r = get_redis()
+    if r is not None:
+        try:
+            return bool(await r.sismember(REDIS_PROCESSED_KEY, tweet_id))
+        except Exception as e:
+            print(f"   [Redis] SISMEMBER failed: {e}")
     return tweet_id in state.get("processed_tweets", [])
 
 
-def mark_tweet_processed(state: Dict, tweet_id: str):
-    """标记推文为已处理"""
+async def mark_tweet_processed(state: Dict, tweet_id: str):
+    """标记推文为已处理 (优先 Redis SET，否则写状态文件)"""
+    r = get_redis()
+    if r is not None:
+        try:
+            await r.sadd(REDIS_PROCESSED_KEY, tweet_id)
+            return
+        except Exception as e:
+            print(f"   [Redis] SADD failed: {e}")
+
     if "processed_tweets" not in state:
         state["processed_tweets"] = []
 
@@ -570,6 +748,12 @@ MIN_IMAGES = 1
 # 文本最小长度 (过滤太短的推文)
 MIN_TEXT_LENGTH = 30
 
+# 中文描述性词汇 (长文本中出现时视为自然语言提示词)
+CHINESE_DESCRIPTORS = ["风格", "场景", "背景", "人物", "颜色", "光线", "氛围", "构图"]
+
+# 预编译为单个正则，一次线性扫描代替逐词 in 查找
+_CHINESE_DESC_RE = re.compile("|".join(map(re.escape, CHINESE_DESCRIPTORS)))
+
 
 def is_likely_prompt_tweet(tweet: Dict) -> tuple[bool, str]:
     """
@@ -605,10 +789,9 @@ def is_likely_prompt_tweet(tweet: Dict) -> tuple[bool, str]:
     # 通常提示词会有较长的连续描述
     if len(text) > 200:
         # 检查是否有中文描述性内容
-        chinese_descriptors = ["风格", "场景", "背景", "人物", "颜色", "光线", "氛围", "构图"]
-        for desc in chinese_descriptors:
-            if desc in text:
-                return True, f"descriptive: {desc}"
+        match = _CHINESE_DESC_RE.search(text)
+        if match:
+            return True, f"descriptive: {match.group(0)}"
 
     return False, "no_match"
 
@@ -814,7 +997,7 @@ def parse_nitter_rss(xml_content: str, username: str, count: int = 20) -> List[D
     return tweets
 
 
-def fetch_user_timeline_syndication(username: str, count: int = 20) -> List[Dict]:
+async def fetch_user_timeline_syndication(username: str, count: int = 20) -> List[Dict]:
     """
     使用 Twitter Syndication API 获取用户时间线
     这是 Twitter 官方的嵌入 API，不需要认证
@@ -830,7 +1013,7 @@ def fetch_user_timeline_syndication(username: str, count: int = 20) -> List[Dict
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = await get_http_client().get(url, headers=headers, timeout=15)
 
         if response.status_code == 200:
             # 从 JSON 数据中提取 tweet IDs
@@ -918,13 +1101,13 @@ def fetch_user_timeline_rsshub(username: str, count: int = 20) -> List[Dict]:
     return tweets
 
 
-def fetch_tweet_details(tweet_id: str, username: str) -> Optional[Dict]:
+async def fetch_tweet_details(tweet_id: str, username: str) -> Optional[Dict]:
     """
     获取单条推文的详细信息 (包括图片、互动数据)
     使用 FxTwitter/VxTwitter API
     """
     try:
-        data = fetch_with_fxtwitter(tweet_id, username)
+        data = await fetch_api_cached("fx", fetch_with_fxtwitter_async, tweet_id, username)
         result = parse_fxtwitter_result(data)
         if result and result.get("text"):
             stats = result.get("stats", {})
@@ -938,12 +1121,13 @@ def fetch_tweet_details(tweet_id: str, username: str) -> Optional[Dict]:
                 "retweets": stats.get("retweets", 0),
                 "views": stats.get("views", 0),
                 "created_at": result.get("created_at"),
+                "_fx": data,  # 供 process_tweet 复用，避免重复请求
             }
     except Exception:
         pass
 
     try:
-        data = fetch_with_vxtwitter(tweet_id, username)
+        data = await fetch_api_cached("vx", fetch_with_vxtwitter_async, tweet_id, username)
         result = parse_vxtwitter_result(data)
         if result and result.get("text"):
             stats = result.get("stats", {})
@@ -966,6 +1150,20 @@ def fetch_tweet_details(tweet_id: str, username: str) -> Optional[Dict]:
 
 # ========== X/Twitter 客户端 ==========
 
+def full_jitter_delay(retry_count: int, base: float = DELAY_ON_RATE_LIMIT,
+                      error: Optional[Exception] = None) -> float:
+    """指数退避 + 随机抖动，分散多个账号同时遇到 429 后的重试时间
+
+    等待 base 加上 [0, base * 2^retry_count] 内的随机抖动 (抖动不超过 MAX_DELAY_ON_RATE_LIMIT)，
+    第一次重试也有抖动；有 rate_limit_reset 时至少等到重置时间
+    """
+    delay = base + random.uniform(0, min(MAX_DELAY_ON_RATE_LIMIT, base * (2 ** retry_count)))
+    reset = getattr(error, 'rate_limit_reset', None)
+    if reset:
+        delay = max(delay, reset - time.time())
+    return delay
+
+
 def random_delay(delay_range: tuple, description: str = ""):
     """添加随机延迟，模拟人类行为"""
     delay = random.uniform(delay_range[0], delay_range[1])
@@ -982,29 +1180,26 @@ class XMonitor:
         self.client = None
         self.logged_in = False
         self.request_count = 0
-        self.last_request_time = 0
+
+    def _cookie_jar(self):
+        """获取 twikit 底层 HTTP 客户端的 CookieJar (新版为 client.http，旧版为 client._session)"""
+        http = getattr(self.client, 'http', None) or getattr(self.client, '_session', None)
+        return getattr(getattr(http, 'cookies', None), 'jar', None)
 
     def _clear_cf_cookies(self):
-        """清理 Cloudflare cookies 避免冲突"""
-        if self.client and hasattr(self.client, '_session') and self.client._session:
-            try:
-                # 获取 session 的 cookies jar
-                session = self.client._session
-                if hasattr(session, 'cookies') and hasattr(session.cookies, 'jar'):
-                    # 删除所有 __cf_bm cookies
-                    cookies_to_remove = []
-                    for cookie in session.cookies.jar:
-                        if cookie.name == '__cf_bm':
-                            cookies_to_remove.append((cookie.name, cookie.domain))
-                    for name, domain in cookies_to_remove:
-                        try:
-                            session.cookies.delete(name, domain=domain)
-                        except:
-                            pass
-                    if cookies_to_remove:
-                        print(f"   [twikit] Cleared {len(cookies_to_remove)} __cf_bm cookies")
-            except Exception as e:
-                print(f"   [twikit] Failed to clear cookies: {e}")
+        """清理 Cloudflare cookies 避免冲突 (只删除 __cf_bm，保留 cf_clearance 等验证 cookie)"""
+        jar = self._cookie_jar()
+        if jar is None:
+            return
+
+        try:
+            stale = [c for c in jar if c.name == '__cf_bm']
+            for cookie in stale:
+                jar.clear(cookie.domain, cookie.path, cookie.name)
+            if stale:
+                print(f"   [twikit] Cleared {len(stale)} __cf_bm cookies")
+        except Exception as e:
+            print(f"   [twikit] Failed to clear cookies: {e}")
 
     async def init_client(self):
         """初始化客户端 - 使用 twikit + cookies"""
@@ -1102,15 +1297,7 @@ class XMonitor:
         # 检查是否是 TooManyRequests 异常
         if 'TooManyRequests' in str(type(e).__name__) or '429' in str(e):
             if retry_count < MAX_RETRIES_ON_RATE_LIMIT:
-                # 尝试获取重置时间
-                wait_time = DELAY_ON_RATE_LIMIT * (retry_count + 1)  # 指数退避
-                if hasattr(e, 'rate_limit_reset') and e.rate_limit_reset:
-                    wait_time = max(wait_time, e.rate_limit_reset - time.time())
-
-                # 添加随机抖动 (jitter)
-                jitter = random.uniform(0, 10)
-                wait_time += jitter
-
+                wait_time = full_jitter_delay(retry_count, error=e)
                 print(f"   [Rate Limit] Waiting {wait_time:.0f}s before retry ({retry_count + 1}/{MAX_RETRIES_ON_RATE_LIMIT})...")
                 await asyncio.sleep(wait_time)
                 return True
@@ -1129,14 +1316,9 @@ class XMonitor:
                 # 清理可能冲突的 Cloudflare cookies
                 self._clear_cf_cookies()
 
-                # API 调用间隔
-                time_since_last = time.time() - self.last_request_time
-                if time_since_last < DELAY_BETWEEN_API_CALLS[0]:
-                    await asyncio.sleep(DELAY_BETWEEN_API_CALLS[0] - time_since_last + random.uniform(0, 1))
-
                 # 先获取用户信息
-                user = await self.client.get_user_by_screen_name(username)
-                self.last_request_time = time.time()
+                async with x_rate_limit():
+                    user = await self.client.get_user_by_screen_name(username)
                 self.request_count += 1
 
                 if not user:
@@ -1147,24 +1329,21 @@ class XMonitor:
                 await asyncio.sleep(random.uniform(*DELAY_BETWEEN_API_CALLS))
 
                 # 获取用户推文
-                user_tweets = await self.client.get_user_tweets(user.id, 'Tweets', count=count)
-                self.last_request_time = time.time()
+                async with x_rate_limit():
+                    user_tweets = await self.client.get_user_tweets(user.id, 'Tweets', count=count)
                 self.request_count += 1
 
                 for tweet in user_tweets:
                     try:
                         # 优先使用 full_text 获取长推文 (note_tweet) 的完整内容
-                        tweet_text = ""
-                        try:
-                            tweet_text = tweet.full_text or tweet.text or ""
-                        except Exception:
-                            tweet_text = tweet.text or ""
+                        tweet_text = getattr(tweet, 'full_text', None) or tweet.text or ""
+                        tweet_url = f"https://x.com/{username}/status/{tweet.id}"
 
                         tweet_data = {
                             "id": tweet.id,
                             "text": tweet_text,
                             "username": username,
-                            "url": f"https://x.com/{username}/status/{tweet.id}",
+                            "url": tweet_url,
                             "likes": tweet.favorite_count or 0,
                             "retweets": tweet.retweet_count or 0,
                             "views": tweet.view_count or 0,
@@ -1174,14 +1353,17 @@ class XMonitor:
 
                         # 提取图片
                         if tweet.media:
+                            # dict 作为有序集合去重，最多 MAX_TWEET_IMAGES 张
+                            seen_imgs = {}
                             for media in tweet.media:
-                                if hasattr(media, 'media_url') and media.media_url:
-                                    img_url = media.media_url
-                                    if img_url.startswith('http://'):
-                                        img_url = img_url.replace('http://', 'https://')
-                                    tweet_data["images"].append(img_url)
-                                elif hasattr(media, 'media_url_https') and media.media_url_https:
-                                    tweet_data["images"].append(media.media_url_https)
+                                img_url = getattr(media, 'media_url_https', None) or getattr(media, 'media_url', None)
+                                if not img_url:
+                                    continue
+                                img_url = 'https://' + img_url[7:] if img_url.startswith('http://') else img_url
+                                seen_imgs[img_url] = None
+                                if len(seen_imgs) >= MAX_TWEET_IMAGES:
+                                    break
+                            tweet_data["images"] = list(seen_imgs)
 
                         tweets.append(tweet_data)
 
@@ -1199,8 +1381,8 @@ class XMonitor:
                 if 'Multiple cookies exist' in error_str or '__cf_bm' in error_str:
                     print(f"   [twikit] Cookie conflict detected, clearing and retrying...")
                     self._clear_cf_cookies()
+                    await asyncio.sleep(full_jitter_delay(retry_count, base=2))
                     retry_count += 1
-                    await asyncio.sleep(random.uniform(2, 5))
                     continue
 
                 # 处理限流
@@ -1213,32 +1395,56 @@ class XMonitor:
 
         # 如果 twikit 失败，尝试使用 FxTwitter 备用方案
         print(f"   [Fallback] Trying Syndication API...")
-        syn_tweets = fetch_user_timeline_syndication(username, count)
+        syn_tweets = await fetch_user_timeline_syndication(username, count)
         if syn_tweets:
-            for st in syn_tweets:
-                # 添加延迟避免 Syndication API 也被限流
-                await asyncio.sleep(random.uniform(0.5, 1.5))
-                details = fetch_tweet_details(st["id"], username)
-                if details:
-                    tweets.append(details)
-                if len(tweets) >= count:
-                    break
+            # 并发获取详情，用 Semaphore 限制并发避免 Syndication API 也被限流
+            sem = asyncio.Semaphore(SYNDICATION_CONCURRENCY)
+
+            async def fetch_details(tweet_id: str) -> Optional[Dict]:
+                async with sem:
+                    return await fetch_tweet_details(tweet_id, username)
+
+            results = await asyncio.gather(*(fetch_details(st["id"]) for st in syn_tweets[:count]))
+            tweets.extend(d for d in results if d)
 
         return tweets
 
 
 # ========== 主处理逻辑 ==========
 
+async def enrich_with_fxtwitter(tweets: List[Dict], state: Dict):
+    """批量预取 FxTwitter 数据，结果挂在 tweet["_fx"] 上供 process_tweet 使用
+
+    已处理或无图片的推文不会进入 process_tweet 的 FxTwitter 步骤，直接跳过；
+    失败的请求以异常对象保存，由 process_tweet 按原逻辑打印。
+    """
+    pending = [
+        t for t in tweets
+        if "_fx" not in t and t.get("images") and not await is_tweet_processed(state, t["id"])
+    ]
+    if not pending:
+        return
+
+    results = await asyncio.gather(
+        *(fetch_api_cached("fx", fetch_with_fxtwitter_async, t["id"], t["username"]) for t in pending),
+        return_exceptions=True
+    )
+    for tweet, result in zip(pending, results):
+        tweet["_fx"] = result
+
+
 async def process_tweet(db: Database, tweet: Dict, state: Dict,
-                        viral_only: bool = False, dry_run: bool = False) -> bool:
+                        viral_only: bool = False, dry_run: bool = False,
+                        executor: Optional[ThreadPoolExecutor] = None) -> bool:
     """处理单条推文 - 使用统一处理函数
 
     Args:
-        db: 数据库连接
+        db: 数据库连接 (只能在 executor 的线程中使用)
         tweet: 推文数据
         state: 处理状态
         viral_only: 是否只处理爆款推文 (保留用于兼容性，但不再使用)
         dry_run: 预览模式，不写入数据库
+        executor: 运行 process_tweet_for_import 的单线程池，与 db 一一对应
     """
     tweet_id = tweet["id"]
     tweet_url = tweet["url"]
@@ -1250,26 +1456,32 @@ async def process_tweet(db: Database, tweet: Dict, state: Dict,
     views = tweet.get("views", 0)
 
     # 检查是否已处理
-    if is_tweet_processed(state, tweet_id):
+    if await is_tweet_processed(state, tweet_id):
         return False
 
     # 检查是否有图片
     if not images:
-        mark_tweet_processed(state, tweet_id)
+        await mark_tweet_processed(state, tweet_id)
         return False
 
     # 尝试用 FxTwitter 获取更完整的文本（展开短链接、获取长推文）
+    # 优先使用 enrich_with_fxtwitter 批量预取的结果，没有时才单独请求
     try:
-        fx_data = fetch_with_fxtwitter(tweet_id, username)
+        fx_data = tweet.get("_fx")
+        if fx_data is None:
+            fx_data = await fetch_api_cached("fx", fetch_with_fxtwitter_async, tweet_id, username)
+        elif isinstance(fx_data, Exception):
+            raise fx_data
         fx_result = parse_fxtwitter_result(fx_data)
         if fx_result:
             fx_text = fx_result.get("text", "")
             if fx_text and len(fx_text) > len(text):
                 print(f"   [FxTwitter] Got longer text: {len(text)} -> {len(fx_text)} chars")
                 text = fx_text
-            # 如果 FxTwitter 有更多图片，补充
-            if fx_result.get("images") and len(fx_result["images"]) > len(images):
-                images = fx_result["images"]
+            # 如果 FxTwitter 有更多图片，补充 (去重并限制数量)
+            fx_images = list(dict.fromkeys(fx_result.get("images") or []))[:MAX_TWEET_IMAGES]
+            if len(fx_images) > len(images):
+                images = fx_images
     except Exception as e:
         print(f"   [FxTwitter] Failed to get full text: {e}")
 
@@ -1279,8 +1491,9 @@ async def process_tweet(db: Database, tweet: Dict, state: Dict,
     print(f"   Stats: ❤️ {likes:,} | 🔁 {retweets:,} | 👁️ {views:,}")
     print(f"   Images: {len(images)}")
 
-    # 使用统一处理函数
-    result = process_tweet_for_import(
+    # 使用统一处理函数 (同步的 AI/数据库调用放到线程中，不阻塞事件循环)
+    result = await asyncio.get_running_loop().run_in_executor(executor, functools.partial(
+        process_tweet_for_import,
         db=db,
         tweet_url=tweet_url,
         raw_text=text,
@@ -1290,9 +1503,9 @@ async def process_tweet(db: Database, tweet: Dict, state: Dict,
         ai_model=AI_MODEL,
         dry_run=dry_run,
         skip_twitter_fetch=True  # 已有 Twitter 图片
-    )
+    ))
 
-    mark_tweet_processed(state, tweet_id)
+    await mark_tweet_processed(state, tweet_id)
 
     if result["success"]:
         return True
@@ -1307,7 +1520,8 @@ async def monitor_accounts(
     accounts: List[str],
     tweets_per_account: int = 10,
     viral_only: bool = False,
-    dry_run: bool = False
+    dry_run: bool = False,
+    concurrency: int = ACCOUNT_CONCURRENCY
 ) -> Dict:
     """监听账号列表
 
@@ -1316,6 +1530,7 @@ async def monitor_accounts(
         tweets_per_account: 每个账号获取的推文数量
         viral_only: 是否只处理爆款推文
         dry_run: 预览模式，不写入数据库
+        concurrency: 同时检查的账号数
     """
 
     print("=" * 60)
@@ -1325,6 +1540,8 @@ async def monitor_accounts(
     print(f"Viral Only: {viral_only}")
     print(f"Dry Run: {dry_run}")
     print(f"AI Model: {AI_MODEL}")
+    print(f"Concurrency: {concurrency} accounts")
+    print(f"Tweet Workers: {TWEET_WORKERS}")
     print(f"Rate Limit: {DELAY_BETWEEN_ACCOUNTS[0]}-{DELAY_BETWEEN_ACCOUNTS[1]}s between accounts")
     print("=" * 60)
 
@@ -1336,6 +1553,8 @@ async def monitor_accounts(
     # 初始化
     db = Database(DATABASE_URL)
     monitor = XMonitor()
+    # 持续模式下由 run_continuous 持有共享客户端，这里只关闭自己创建的
+    owns_http = _HTTP is None or _HTTP.is_closed
     state = load_state()
 
     stats = {
@@ -1356,55 +1575,113 @@ async def monitor_accounts(
         await monitor.init_client()
         print("[X] Client ready")
 
-        # 遍历账号
-        for i, username in enumerate(accounts, 1):
-            print(f"\n[{i}/{len(accounts)}] Checking @{username}...")
+        await migrate_state_to_redis(state)
 
-            try:
-                tweets = await monitor.get_user_tweets(username, tweets_per_account)
-                stats["accounts_checked"] += 1
-                stats["tweets_found"] += len(tweets)
-
-                print(f"   Found {len(tweets)} tweets")
-
-                for tweet in tweets:
-                    result = await process_tweet(db, tweet, state, viral_only=viral_only, dry_run=dry_run)
-                    if result == "filtered_stage1":
-                        stats["filtered_stage1"] += 1
-                    elif result == "filtered_stage2":
-                        stats["filtered_stage2"] += 1
-                    elif result == "advertisement":
-                        stats["advertisement"] += 1
-                    elif result == "prompt_in_reply":
-                        stats["prompt_in_reply"] += 1
-                    elif result is True:
-                        stats["prompts_saved"] += 1
-
-                    # 处理推文间延迟 (避免 AI API 限流)
-                    await asyncio.sleep(random.uniform(*DELAY_BETWEEN_TWEETS))
-
-                # 账号间延迟 (避免 Twitter 限流)
-                delay = random.uniform(*DELAY_BETWEEN_ACCOUNTS)
-                print(f"   [Delay] Next account in {delay:.1f}s...")
-                await asyncio.sleep(delay)
+        # 流水线: 账号抓取 (生产者，Semaphore 限制同时进行的账号数)
+        #         -> 队列 -> 推文处理 (消费者，AI 提取是最慢的环节)
+        sem = asyncio.Semaphore(max(1, concurrency))
+        queue: asyncio.Queue = asyncio.Queue(maxsize=TWEET_QUEUE_SIZE)
+        total = len(accounts)
 
-            except Exception as e:
-                error_str = str(e)
-                print(f"   [Error] {e}")
-                stats["errors"] += 1
+        async def check_account(i: int, username: str):
+            async with sem:
+                print(f"\n[{i}/{total}] Checking @{username}...")
+
+                try:
+                    tweets = await monitor.get_user_tweets(username, tweets_per_account)
+                    stats["accounts_checked"] += 1
+                    stats["tweets_found"] += len(tweets)
+
+                    print(f"   @{username}: found {len(tweets)} tweets")
 
-                # 如果是限流错误，等待更长时间
-                if 'TooManyRequests' in str(type(e).__name__) or '429' in error_str:
-                    wait_time = DELAY_ON_RATE_LIMIT + random.uniform(0, 30)
-                    print(f"   [Rate Limit] Waiting {wait_time:.0f}s before next account...")
-                    await asyncio.sleep(wait_time)
+                    # 一次性并发预取本账号所有推文的 FxTwitter 数据
+                    await enrich_with_fxtwitter(tweets, state)
 
-        # 更新状态
-        state["last_check"] = datetime.now(timezone.utc).isoformat()
-        save_state(state)
+                    for tweet in tweets:
+                        await queue.put(tweet)
+
+                    # 账号间延迟 (避免 Twitter 限流)，在信号量内进行以保持整体请求速率
+                    delay = random.uniform(*DELAY_BETWEEN_ACCOUNTS)
+                    print(f"   [Delay] @{username} done, releasing slot in {delay:.1f}s...")
+                    await asyncio.sleep(delay)
+
+                except Exception as e:
+                    error_str = str(e)
+                    print(f"   [Error] @{username}: {e}")
+                    stats["errors"] += 1
+
+                    # 如果是限流错误，等待更长时间
+                    if 'TooManyRequests' in str(type(e).__name__) or '429' in error_str:
+                        wait_time = full_jitter_delay(MAX_RETRIES_ON_RATE_LIMIT, error=e)
+                        print(f"   [Rate Limit] Waiting {wait_time:.0f}s before next account...")
+                        await asyncio.sleep(wait_time)
+
+        async def produce():
+            try:
+                await asyncio.gather(*(check_account(i, u) for i, u in enumerate(accounts, 1)))
+            finally:
+                # 每个 worker 一个结束标记
+                for _ in range(TWEET_WORKERS):
+                    await queue.put(None)
+
+        async def worker():
+            # 每个 worker 独占一个数据库连接和一个单线程池：psycopg2 连接的事务状态
+            # 不能被多个线程同时使用，连接只在这一个线程中创建和访问
+            worker_db = Database(DATABASE_URL)
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="x-tweet")
+            try:
+                await _worker_loop(worker_db, executor)
+            finally:
+                await asyncio.get_running_loop().run_in_executor(executor, worker_db.close)
+                executor.shutdown(wait=True)
+
+        async def _worker_loop(worker_db: Database, executor: ThreadPoolExecutor):
+            while (tweet := await queue.get()) is not None:
+                try:
+                    result = await process_tweet(worker_db, tweet, state, viral_only=viral_only,
+                                                 dry_run=dry_run, executor=executor)
+                except Exception as e:
+                    print(f"   [Error] Tweet {tweet.get('id')}: {e}")
+                    stats["errors"] += 1
+                    continue
+
+                if result == "filtered_stage1":
+                    stats["filtered_stage1"] += 1
+                elif result == "filtered_stage2":
+                    stats["filtered_stage2"] += 1
+                elif result == "advertisement":
+                    stats["advertisement"] += 1
+                elif result == "prompt_in_reply":
+                    stats["prompt_in_reply"] += 1
+                elif result is True:
+                    stats["prompts_saved"] += 1
+
+                # 处理推文间延迟 (避免 AI API 限流)
+                await asyncio.sleep(random.uniform(*DELAY_BETWEEN_TWEETS))
+
+        # state/stats 只在事件循环线程中更新 (读改写之间没有 await)，无需加锁；
+        # 数据库连接按 worker 隔离，见 worker()
+        await asyncio.gather(produce(), *(worker() for _ in range(TWEET_WORKERS)))
+
+        # 更新状态 (有 Redis 时只写单个键，避免整份状态文件重写)
+        last_check = datetime.now(timezone.utc).isoformat()
+        saved = False
+        r = get_redis()
+        if r is not None:
+            try:
+                await r.set(REDIS_LAST_CHECK_KEY, last_check)
+                saved = True
+            except Exception as e:
+                print(f"[Redis] Set last_check failed: {e}")
+        if not saved:
+            state["last_check"] = last_check
+            save_state(state)
 
     finally:
         db.close()
+        if owns_http:
+            await close_http_client()
+        await close_redis()
 
     # 输出统计
     print("\n" + "=" * 60)
@@ -1427,7 +1704,8 @@ async def run_continuous(
     accounts: List[str],
     interval_minutes: int = 30,
     viral_only: bool = False,
-    dry_run: bool = False
+    dry_run: bool = False,
+    concurrency: int = ACCOUNT_CONCURRENCY
 ):
     """持续监听模式"""
     print(f"Starting continuous monitor (interval: {interval_minutes} min)")
@@ -1435,20 +1713,29 @@ async def run_continuous(
     print(f"Dry Run: {dry_run}")
     print("Press Ctrl+C to stop\n")
 
-    while True:
-        try:
-            await monitor_accounts(accounts, viral_only=viral_only, dry_run=dry_run)
+    # 共享客户端跨轮次复用，后台任务保持连接温热
+    get_http_client()
+    ping_task = asyncio.create_task(keep_http_warm())
 
-            print(f"\nNext check in {interval_minutes} minutes...")
-            await asyncio.sleep(interval_minutes * 60)
+    try:
+        while True:
+            try:
+                await monitor_accounts(accounts, viral_only=viral_only, dry_run=dry_run,
+                                       concurrency=concurrency)
 
-        except KeyboardInterrupt:
-            print("\nStopped by user")
-            break
-        except Exception as e:
-            print(f"\n[Error] {e}")
-            print(f"Retrying in {interval_minutes} minutes...")
-            await asyncio.sleep(interval_minutes * 60)
+                print(f"\nNext check in {interval_minutes} minutes...")
+                await asyncio.sleep(interval_minutes * 60)
+
+            except KeyboardInterrupt:
+                print("\nStopped by user")
+                break
+            except Exception as e:
+                print(f"\n[Error] {e}")
+                print(f"Retrying in {interval_minutes} minutes...")
+                await asyncio.sleep(interval_minutes * 60)
+    finally:
+        ping_task.cancel()
+        await close_http_client()
 
 
 # ========== CLI ==========
@@ -1499,6 +1786,8 @@ Examples:
                         help="Only process viral tweets (likes>=1000, retweets>=500, views>=100k)")
     parser.add_argument("--dry-run", "-d", action="store_true",
                         help="Dry run mode - fetch and process but don't save to database")
+    parser.add_argument("--concurrency", type=int, default=ACCOUNT_CONCURRENCY,
+                        help=f"Accounts checked concurrently (default: {ACCOUNT_CONCURRENCY})")
 
     args = parser.parse_args()
 
@@ -1520,7 +1809,10 @@ Examples:
     # 解析账号列表
     if args.accounts:
         # 指定账号模式：只使用指定的账号
-        accounts = [a.strip() for a in args.accounts.split(",") if a.strip()]
+        accounts = list(dict.fromkeys(a.strip() for a in args.accounts.split(",") if a.strip()))
+        custom = [a for a in accounts if a.lower() not in _DEFAULT_ACCOUNTS_LOWER]
+        if custom:
+            print(f"[Accounts] {len(custom)} of {len(accounts)} accounts not in default list")
     else:
         # 合并模式：数据库高频作者 + 默认账号列表
         db_authors = []
@@ -1539,11 +1831,12 @@ Examples:
         # 合并并去重（保持顺序：数据库优先，然后是默认列表中的新账号）
         seen = set()
         accounts = []
-        for author in db_authors + DEFAULT_ACCOUNTS:
+        for author in itertools.chain(db_authors, DEFAULT_ACCOUNTS):
             author_lower = author.lower()  # 忽略大小写去重
-            if author_lower not in seen:
-                seen.add(author_lower)
-                accounts.append(author)
+            if author_lower in seen:
+                continue
+            seen.add(author_lower)
+            accounts.append(author)
 
         print(f"[Accounts] Total {len(accounts)} unique accounts (DB: {len(db_authors)}, Default: {len(DEFAULT_ACCOUNTS)})")
 
@@ -1553,14 +1846,16 @@ Examples:
             accounts,
             interval_minutes=args.interval,
             viral_only=args.viral_only,
-            dry_run=args.dry_run
+            dry_run=args.dry_run,
+            concurrency=args.concurrency
         ))
     else:
         asyncio.run(monitor_accounts(
             accounts,
             tweets_per_account=args.count,
             viral_only=args.viral_only,
-            dry_run=args.dry_run
+            dry_run=args.dry_run,
+            concurrency=args.concurrency
         ))
 
 
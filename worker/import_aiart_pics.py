@@ -19,19 +19,50 @@ AIART.PICS 提示词导入脚本
   python import_aiart_pics.py --limit 10         # 限制导入数量
   python import_aiart_pics.py --dry-run          # 预览模式
   python import_aiart_pics.py --pages 5          # 只获取前 5 页
+  python import_aiart_pics.py --workers 8        # 8 个并发 worker
+  python import_aiart_pics.py --no-cache         # 不使用推文/分类结果缓存
+  python import_aiart_pics.py --bulk-mode        # 全量回填: 大批量 COPY 写入
+  python import_aiart_pics.py --quiet            # 不输出逐条日志
+  python import_aiart_pics.py --resume-offset    # 归档回填: 从上次未处理完的列表页继续
   python import_aiart_pics.py --reset            # 重置进度
 """
 
 import argparse
-import json
+import asyncio
+import importlib.util
 import os
 import re
+import signal
+import sqlite3
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Dict, List, Optional
 
-import requests
+import httpx
+
+# HTTP/2 需要 h2 (pip install "httpx[http2]")，只检查是否安装，不需要导入
+HAS_H2 = importlib.util.find_spec("h2") is not None
+
+# brotli (可选，httpx 安装后才能解码 br 压缩响应)
+HAS_BROTLI = any(importlib.util.find_spec(name) is not None for name in ("brotli", "brotlicffi"))
+
+# ijson (可选，流式解析列表响应)
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+# uvloop (可选，更快的事件循环，Windows 不支持)
+HAS_UVLOOP = False
+if sys.platform != "win32":
+    try:
+        import uvloop
+        HAS_UVLOOP = True
+    except ImportError:
+        pass
 
 # 加载环境变量
 try:
@@ -51,9 +82,25 @@ except ImportError:
     pass
 
 # 导入主模块
-from main import Database, AI_MODEL
-from prompt_utils import process_tweet_for_import
-from fetch_twitter_content import fetch_with_fxtwitter, parse_fxtwitter_result
+from main import AI_MODEL, BufferedPromptWriter, Database
+from prompt_utils import (
+    FailedItemsLog,
+    batch_queue_stage,
+    cache_get,
+    cache_put,
+    classify_for_import_batch,
+    drain_queue,
+    finalize_tweet_import,
+    json_loads,
+    prepare_tweet_for_import,
+    set_result_cache_dir,
+    writer_flush_stage,
+)
+from fetch_twitter_content import (
+    TWEET_API_BUCKET,
+    fetch_with_fxtwitter_async,
+    parse_fxtwitter_result,
+)
 
 # ========== 配置 ==========
 BASE_URL = "https://aiart.pics"
@@ -61,7 +108,16 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "")
 
 # 数据文件
 CACHE_DIR = Path(__file__).parent / "cache"
+# 已处理 ID 存放在 sqlite 中，逐条插入，无需启动时加载或结束时重写整个文件
+PROGRESS_DB = CACHE_DIR / "aiart_pics_import_progress.sqlite"
+# 旧版 JSON 进度快照和进度日志，首次打开 PROGRESS_DB 时迁移
 PROGRESS_FILE = CACHE_DIR / "aiart_pics_import_progress.json"
+PROGRESS_JOURNAL = PROGRESS_FILE.with_suffix(".jsonl")
+# Twitter 抓取 / AI 分类结果缓存 (CACHE_DIR/tweets, CACHE_DIR/classify)，以及详情缓存 (CACHE_DIR/details)
+RESULT_CACHE_DIR = CACHE_DIR
+
+# 图片 CDN 地址前缀
+IMG_BASE_URL = "https://img1.aiart.pics/"
 
 # 失败记录
 FAILED_OUTPUT_DIR = Path(__file__).parent / "failed_imports"
@@ -70,23 +126,61 @@ FAILED_OUTPUT_DIR = Path(__file__).parent / "failed_imports"
 DEFAULT_MIN_LIKES = 100
 DEFAULT_MIN_RETWEETS = 0
 
+# 并发处理的 worker 数 (Twitter/AI 调用较慢，保守取值避免限流)
+DEFAULT_WORKERS = 4
+
+# 同时进行的 HTTP 请求数 (列表/详情/互动数据共享) 和连接池大小
+HTTP_CONCURRENCY = 16
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+# 只声明能解码的压缩格式，br 需要 brotli
+HTTP_HEADERS = {"Accept-Encoding": "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate"}
+
+# AI 分类阶段的 worker 数和等待队列长度 (分类与下一条的抓取/提取并发进行)
+CLASSIFY_WORKERS = 2
+CLASSIFY_QUEUE_SIZE = 64
+
+# 批量分类: 攒够 CLASSIFY_BATCH_SIZE 条或等待 CLASSIFY_BATCH_WAIT 秒后合并为一次 AI 请求
+CLASSIFY_BATCH_SIZE = 8
+CLASSIFY_BATCH_WAIT = 2.0
+
+# 详情缓存有效期 (秒)，重复运行/调整过滤条件时不必重新下载详情
+DETAIL_CACHE_TTL = 30 * 24 * 3600
+
+# 批量写入数据库的条数 (未满时每 flush_interval 秒也会写入一次)
+SAVE_BATCH_SIZE = 500
+# --bulk-mode 下每批写入条数 (用 COPY 代替多行 INSERT)
+BULK_SAVE_BATCH_SIZE = 2000
+# 写入阶段检查缓冲区的间隔 (秒)
+WRITER_POLL_INTERVAL = 0.2
+
+# 已处理 ID 每批最多写入的条数
+PROGRESS_BATCH_SIZE = 50
+
+# asyncio.to_thread 使用的线程池大小 (Twitter/AI/数据库调用都是阻塞 I/O)
+THREAD_POOL_SIZE = 16
+
+
+# 每条记录都要解析 x_url，正则预编译一次
+X_STATUS_RE = re.compile(r'x\.com/([^/]+)/status/(\d+)')
+
 
 def extract_tweet_info(x_url: str) -> tuple:
     """从 X URL 提取 tweet_id 和 username"""
-    match = re.search(r'x\.com/([^/]+)/status/(\d+)', x_url)
+    match = X_STATUS_RE.search(x_url)
     if match:
         return match.group(2), match.group(1)  # tweet_id, username
     return None, None
 
 
-def fetch_engagement_stats(x_url: str) -> dict:
-    """获取推文互动数据"""
+async def fetch_engagement_stats(client: httpx.AsyncClient, x_url: str) -> dict:
+    """获取推文互动数据，与 fetch_tweet 共享推文 API 限速"""
     tweet_id, username = extract_tweet_info(x_url)
     if not tweet_id:
         return {}
 
     try:
-        fx_data = fetch_with_fxtwitter(tweet_id, username)
+        await TWEET_API_BUCKET.acquire_async()
+        fx_data = await fetch_with_fxtwitter_async(client, tweet_id, username)
         fx_result = parse_fxtwitter_result(fx_data)
         return fx_result.get("stats", {})
     except Exception as e:
@@ -116,24 +210,45 @@ def check_engagement_threshold(stats: dict, min_likes: int = 0, min_retweets: in
     return True, ""
 
 
-def fetch_prompts_from_api(limit: int = 50, offset: int = 0) -> List[Dict]:
-    """通过 API 获取提示词列表"""
+class _AsyncBytesReader:
+    """把 httpx 响应的字节流包装成 ijson 需要的 async read()"""
+
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+
+    async def read(self, size: int = -1) -> bytes:
+        # ijson 先用 read(0) 探测返回类型，此时不能消耗数据
+        if size == 0:
+            return b""
+        return await anext(self._chunks, b"")
+
+
+async def fetch_prompts_from_api(client: httpx.AsyncClient, limit: int = 50, offset: int = 0) -> List[Dict]:
+    """通过 API 获取提示词列表，安装了 ijson 时边下载边逐条解析 prompts"""
     url = f"{BASE_URL}/api/prompts?limit={limit}&offset={offset}"
 
-    response = requests.get(url, timeout=30)
-    if response.status_code != 200:
-        return []
-    return response.json().get("prompts", [])
+    if not HAS_IJSON:
+        response = await client.get(url)
+        if response.status_code != 200:
+            return []
+        return json_loads(response.content).get("prompts", [])
+
+    async with client.stream("GET", url) as response:
+        if response.status_code != 200:
+            return []
+        return [
+            item async for item in ijson.items(_AsyncBytesReader(response), "prompts.item", use_float=True)
+        ]
 
 
-def fetch_prompt_detail(prompt_id: str) -> Optional[Dict]:
+async def fetch_prompt_detail(client: httpx.AsyncClient, prompt_id: str) -> Optional[Dict]:
     """获取单个 prompt 的详细信息（包含 originUrl）"""
     url = f"{BASE_URL}/api/prompts/{prompt_id}"
     try:
-        response = requests.get(url, timeout=30)
+        response = await client.get(url)
         if response.status_code != 200:
             return None
-        data = response.json()
+        data = json_loads(response.content)
         if data.get("success"):
             return data.get("data", {})
         return None
@@ -142,6 +257,27 @@ def fetch_prompt_detail(prompt_id: str) -> Optional[Dict]:
         return None
 
 
+async def fetch_prompt_details(client: httpx.AsyncClient, sem: asyncio.Semaphore,
+                               item_ids: List[str]) -> List[Optional[Dict]]:
+    """并发获取一页条目的详情，顺序与 item_ids 一致 (启用结果缓存时先读 CACHE_DIR/details)"""
+
+    async def fetch_one(item_id: str) -> Optional[Dict]:
+        cached = cache_get("details", item_id, max_age=DETAIL_CACHE_TTL)
+        if cached is not None:
+            return cached
+        async with sem:
+            detail = await fetch_prompt_detail(client, item_id)
+        cache_put("details", item_id, detail)
+        return detail
+
+    return await asyncio.gather(*(fetch_one(item_id) for item_id in item_ids))
+
+
+def has_full_data(item: Dict) -> bool:
+    """列表 API 返回的记录是否已包含导入所需的 originUrl 和 prompts"""
+    return bool(item.get("originUrl") and item.get("prompts"))
+
+
 def extract_data_from_api_item(item: Dict) -> Optional[Dict]:
     """从 API 返回的 item 中提取需要的数据"""
     origin_url = item.get("originUrl", "")
@@ -152,123 +288,177 @@ def extract_data_from_api_item(item: Dict) -> Optional[Dict]:
     prompts = item.get("prompts", [])
     prompt_text = "\n".join(prompts) if prompts else ""
 
-    # 提取标题 (优先英文)
-    title_obj = item.get("title", {})
+    # 提取标题 (优先英文)，字段为 null 时也按缺失处理
+    title_obj = item.get("title") or {}
     title = title_obj.get("en") or title_obj.get("zh") or ""
 
-    # 提取图片 URL
-    images = []
-    img_base = "https://img1.aiart.pics/"
-    for img in item.get("images", []):
-        path = img.get("path", "")
-        if path:
-            images.append(f"{img_base}{path}")
+    # 提取图片 URL (前缀绑定为局部变量，推导式内不再逐次查全局)
+    img_base = IMG_BASE_URL
+    images = [img_base + path for img in item.get("images") or () if (path := img.get("path"))]
 
     # 提取作者
-    author_obj = item.get("author", {})
+    author_obj = item.get("author") or {}
     author = author_obj.get("username") or author_obj.get("name") or ""
 
-    # 提取标签
-    tags = item.get("tags", [])
+    # 提取标签 (标签/作者在各页大量重复，驻留后同一字符串只保留一份)
+    tags = [sys.intern(tag) for tag in item.get("tags") or () if isinstance(tag, str)]
 
     return {
-        "x_url": origin_url.replace("twitter.com", "x.com"),
+        "x_url": origin_url.replace("twitter.com", "x.com", 1) if "twitter.com" in origin_url else origin_url,
         "prompt": prompt_text,
         "title": title,
         "images": images,
-        "author": author,
+        "author": sys.intern(author),
         "tags": tags,
         "id": item.get("id", ""),
     }
 
 
-def load_progress() -> Dict:
-    """加载处理进度"""
-    if PROGRESS_FILE.exists():
-        try:
-            with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            pass
-    return {"processed_slugs": [], "last_updated": None}
-
-
-def save_progress(progress: Dict):
-    """保存处理进度"""
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    progress["last_updated"] = datetime.now(timezone.utc).isoformat()
-
-    try:
-        with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(progress, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"⚠️ 保存进度失败: {e}")
-
+class ProgressStore:
+    """已处理条目 ID 的 sqlite 存储 (WAL 模式，逐条写入即持久化)"""
 
-def clear_progress():
-    """清除处理进度"""
-    if PROGRESS_FILE.exists():
-        PROGRESS_FILE.unlink()
-        print("🗑️ 已清除处理进度")
+    def __init__(self, path: Optional[Path] = None):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path or PROGRESS_DB, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS slugs (slug TEXT PRIMARY KEY)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._migrate_json_progress()
 
+    def _migrate_json_progress(self):
+        """导入旧版 JSON 进度快照和进度日志，成功后删除旧文件"""
+        ids = []
+        try:
+            if PROGRESS_FILE.exists():
+                progress = json_loads(PROGRESS_FILE.read_bytes())
+                ids.extend(progress.get("processed_slugs", []))
+                if progress.get("last_updated"):
+                    self._set_meta("last_updated", progress["last_updated"])
+            if PROGRESS_JOURNAL.exists():
+                with open(PROGRESS_JOURNAL, "rb") as f:
+                    ids.extend(json_loads(line) for line in f if line.strip())
+        except Exception as e:
+            print(f"⚠️ 迁移旧版进度文件失败: {e}")
+            return
+
+        if not ids and not PROGRESS_FILE.exists() and not PROGRESS_JOURNAL.exists():
+            return
+
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO slugs (slug) VALUES (?)", ((i,) for i in ids))
+        for path in (PROGRESS_FILE, PROGRESS_JOURNAL):
+            if path.exists():
+                path.unlink()
+        print(f"📦 已迁移旧版进度文件: {len(ids)} 条")
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def __contains__(self, item_id: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM slugs WHERE slug = ?", (item_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM slugs").fetchone()[0]
+
+    def filter_processed(self, item_ids: List[str]) -> set:
+        """批量检查一页条目，返回已处理的 ID 集合 (一次查询代替逐条检查)"""
+        if not item_ids:
+            return set()
+        placeholders = ",".join("?" * len(item_ids))
+        rows = self.conn.execute(f"SELECT slug FROM slugs WHERE slug IN ({placeholders})", item_ids)
+        return {row[0] for row in rows}
+
+    def add(self, item_id: str):
+        """记录已处理条目"""
+        self.conn.execute("INSERT OR IGNORE INTO slugs (slug) VALUES (?)", (item_id,))
+
+    def add_many(self, item_ids: List[str]):
+        """在一个事务中记录多条已处理条目"""
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany("INSERT OR IGNORE INTO slugs (slug) VALUES (?)", ((i,) for i in item_ids))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
 
-def save_failed_items(failed_items: List[Dict], timestamp: str) -> Optional[Path]:
-    """保存失败记录"""
-    if not failed_items:
-        return None
+    @property
+    def resume_offset(self) -> int:
+        """上次运行中第一个未处理完的列表页 offset，续传时从这一页开始翻页"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'resume_offset'").fetchone()
+        return int(row[0]) if row else 0
 
-    FAILED_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    filepath = FAILED_OUTPUT_DIR / f"aiart_pics_failed_{timestamp}.json"
+    @resume_offset.setter
+    def resume_offset(self, offset: int):
+        self._set_meta("resume_offset", str(offset))
 
-    output = {
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-        "total": len(failed_items),
-        "items": failed_items
-    }
+    @property
+    def last_updated(self) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'last_updated'").fetchone()
+        return row[0] if row else None
 
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    def clear(self):
+        """清除处理进度"""
+        self.conn.execute("DELETE FROM slugs")
+        self.conn.execute("DELETE FROM meta")
 
-    return filepath
+    def close(self, touch: bool = False):
+        """关闭存储，touch=True 时记录本次更新时间"""
+        if touch:
+            self._set_meta("last_updated", datetime.now(timezone.utc).isoformat())
+        self.conn.close()
 
 
-def process_api_item(db: Database, api_data: Dict, dry_run: bool = False) -> Dict[str, Any]:
+def prepare_api_item(db, api_data: Dict) -> tuple:
     """
-    处理 API 返回的单个条目
+    处理 API 条目的第一步: 校验 + 查重 + Twitter 获取 + AI 提取
 
-    返回: {"success": bool, "method": str, "error": str or None, "twitter_failed": bool}
+    返回: (result, prepared)，见 prompt_utils.prepare_tweet_for_import
     """
     x_url = api_data.get("x_url", "")
     raw_prompt = api_data.get("prompt", "")
     api_author = api_data.get("author", "")
 
     if not x_url:
-        return {"success": False, "method": "skipped", "error": "No x_url", "twitter_failed": False}
+        return {"success": False, "method": "skipped", "error": "No x_url", "twitter_failed": False}, None
 
     if not raw_prompt:
-        return {"success": False, "method": "skipped", "error": "No prompt", "twitter_failed": False}
+        return {"success": False, "method": "skipped", "error": "No prompt", "twitter_failed": False}, None
 
-    return process_tweet_for_import(
+    return prepare_tweet_for_import(
         db=db,
         tweet_url=x_url,
         raw_text=raw_prompt,
         author=api_author or None,
-        import_source="aiart_pics",
-        ai_model=AI_MODEL,
-        dry_run=dry_run
+        ai_model=AI_MODEL
     )
 
 
-def run_import(limit: int = None, max_pages: int = None, dry_run: bool = False,
-               resume: bool = True, reset_progress: bool = False,
-               min_likes: int = DEFAULT_MIN_LIKES, min_retweets: int = DEFAULT_MIN_RETWEETS):
-    """导入流程 - 通过 API 获取数据"""
+async def run_import_async(limit: int = None, max_pages: int = None, dry_run: bool = False,
+                           resume: bool = True, reset_progress: bool = False,
+                           min_likes: int = DEFAULT_MIN_LIKES, min_retweets: int = DEFAULT_MIN_RETWEETS,
+                           workers: int = DEFAULT_WORKERS, use_cache: bool = True,
+                           bulk_mode: bool = False, quiet: bool = False, resume_offset: bool = False):
+    """导入流程 - 通过 API 获取数据
+
+    生产者按页获取列表，并发获取详情并批量查重后放入队列，workers 个 worker 并发处理条目；
+    列表/详情/互动数据通过共享的 httpx.AsyncClient 异步请求 (HTTP/2 可用时启用)；
+    Twitter/AI/数据库都是同步调用，通过 asyncio.to_thread 放到线程中执行
+
+    列表按发布时间倒序，默认每次从第 1 页开始，保证新发布的条目总能被获取；
+    resume_offset=True 时 (归档回填) 从上次未处理完的列表页继续，并在结束时更新该位置
+    """
     print("=" * 70)
     print("📦 AIART.PICS 导入 (API + Twitter)")
     print("=" * 70)
     print(f"数据源: {BASE_URL}/api/prompts")
     print(f"预览模式: {dry_run}")
     print(f"断点续传: {resume}")
+    print(f"并发数: {workers}")
+    print(f"结果缓存: {RESULT_CACHE_DIR if use_cache else '禁用'}")
+    if bulk_mode:
+        print(f"批量回填: COPY 写入，每批 {BULK_SAVE_BATCH_SIZE} 条")
     if limit:
         print(f"限制数量: {limit}")
     if max_pages:
@@ -277,21 +467,29 @@ def run_import(limit: int = None, max_pages: int = None, dry_run: bool = False,
         print(f"过滤条件: min_likes={min_likes}, min_retweets={min_retweets}")
     print("=" * 70)
 
-    # 重置进度
-    if reset_progress:
-        clear_progress()
-
     # 检查配置
     if not DATABASE_URL:
         print("❌ 缺少 DATABASE_URL 环境变量")
         sys.exit(1)
 
-    # 加载进度
-    progress = load_progress()
-    processed_ids = set(progress.get("processed_slugs", []))  # 现在存储 ID 而非 slug
-    if resume and processed_ids:
-        print(f"📊 已处理: {len(processed_ids)} 条")
-        print(f"   上次更新: {progress.get('last_updated', 'N/A')}")
+    # 默认线程池按 I/O 并发量设置，避免各阶段 worker 争抢线程
+    pool_size = max(THREAD_POOL_SIZE, workers + CLASSIFY_WORKERS)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="aiart")
+    )
+
+    # 断点续传/重复运行时复用已抓取的推文和分类结果
+    set_result_cache_dir(RESULT_CACHE_DIR if use_cache else None)
+
+    # 打开进度存储 (存储 ID 而非 slug)
+    processed_ids = ProgressStore()
+    if reset_progress:
+        processed_ids.clear()
+        print("🗑️ 已清除处理进度")
+    processed_total = len(processed_ids)
+    if resume and processed_total:
+        print(f"📊 已处理: {processed_total} 条")
+        print(f"   上次更新: {processed_ids.last_updated or 'N/A'}")
 
     # 连接数据库
     db = Database(DATABASE_URL)
@@ -302,6 +500,17 @@ def run_import(limit: int = None, max_pages: int = None, dry_run: bool = False,
         print(f"❌ 数据库连接失败: {e}")
         sys.exit(1)
 
+    # 入库记录先缓冲，再批量写入
+    # 由独立的写入阶段 (writer_flush_stage) 负责写库，分类线程只把记录放入缓冲区
+    writer = BufferedPromptWriter(
+        db,
+        batch_size=BULK_SAVE_BATCH_SIZE if bulk_mode else SAVE_BATCH_SIZE,
+        auto_flush=False,
+        use_copy=bulk_mode,
+    )
+    # 一次加载已有链接，之后的查重都在内存中完成
+    print(f"📊 已有链接: {await asyncio.to_thread(writer.preload_existing)} 条")
+
     # 统计
     stats = {
         "pages": 0,
@@ -311,142 +520,387 @@ def run_import(limit: int = None, max_pages: int = None, dry_run: bool = False,
         "filtered": 0,  # 互动数不达标
         "failed": 0,
         "twitter_failed": 0,
+        "detail_fetches_saved": 0,  # 列表数据已完整，免去的详情请求
     }
 
-    failed_items = []
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    failed_items = FailedItemsLog(FAILED_OUTPUT_DIR / f"aiart_pics_failed_{timestamp}.jsonl",
+                                  enabled=not dry_run)
     processed_count = 0
 
-    page_num = 0
     page_size = 50
-
-    while True:
-        # 检查是否达到页数限制
-        if max_pages and page_num >= max_pages:
-            print(f"\n📄 已达到最大页数 {max_pages}")
-            break
-
-        # 检查是否达到数量限制
-        if limit and processed_count >= limit:
-            print(f"\n📊 已达到数量限制 {limit}")
-            break
-
-        # 通过 API 获取数据
-        offset = page_num * page_size
-        print(f"\n📄 获取第 {page_num + 1} 页 (offset={offset})...")
+    # 归档回填时跳过已全部处理完的列表页，不再重新请求和解析
+    # (列表新条目插在最前面，offset 会整体后移，因此只在显式开启时使用)
+    start_page = processed_ids.resume_offset // page_size if resume and resume_offset else 0
+    if start_page:
+        print(f"📄 从第 {start_page + 1} 页继续 (offset={start_page * page_size})")
+    # 每页尚未记录为已处理的 ID (offset -> ID 集合)，结束时据此计算下次的续传起点
+    page_pending: Dict[int, set] = {}
+    item_page: Dict[str, int] = {}
+    reached_end = False
+    workers = max(1, workers)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    classify_queue: asyncio.Queue = asyncio.Queue(maxsize=CLASSIFY_QUEUE_SIZE)
+    # 本次运行中已入队或已确认存在的 x_url，重复出现时直接跳过
+    seen_urls = set()
+
+    # 列表/详情/互动数据请求共享一个连接池，并发数由 http_sem 限制
+    # 有 h2 时走 HTTP/2，并发请求在同一条 TLS 连接上多路复用
+    client = httpx.AsyncClient(http2=HAS_H2, limits=HTTP_LIMITS, headers=HTTP_HEADERS,
+                               timeout=30, follow_redirects=True)
+    http_sem = asyncio.Semaphore(HTTP_CONCURRENCY)
+
+    # 已处理 ID 先入队，由 batch_queue_stage 攒批后在一个事务中写入
+    progress_queue: asyncio.Queue = asyncio.Queue()
+
+    def mark_processed(item_id: str):
+        if not dry_run:
+            progress_queue.put_nowait(item_id)
+            offset = item_page.pop(item_id, None)
+            if offset is not None:
+                page_pending[offset].discard(item_id)
+
+    # 记录已进入写入缓冲区的条目 (item_id -> source_link)，写库成功后才记录进度；
+    # 写入失败的条目不记录，下次运行重新处理
+    awaiting_flush: Dict[str, str] = {}
+
+    def release_flushed():
+        for item_id, source_link in list(awaiting_flush.items()):
+            if writer.is_pending(source_link):
+                continue
+            del awaiting_flush[item_id]
+            if source_link not in writer.failed_links:
+                mark_processed(item_id)
+
+    def save_resume_offset():
+        incomplete = [offset for offset, ids in page_pending.items() if ids]
+        if incomplete:
+            processed_ids.resume_offset = min(incomplete)
+        elif reached_end:
+            # 完整翻完一遍后下次从头开始，以便发现新发布的条目
+            processed_ids.resume_offset = 0
+        elif page_pending:
+            processed_ids.resume_offset = max(page_pending) + page_size
+
+    filter_engagement = min_likes > 0 or min_retweets > 0
+
+    async def fetch_engagement(x_url: str) -> dict:
+        async with http_sem:
+            return await fetch_engagement_stats(client, x_url)
+
+    # 以下共享状态 (stats/processed_ids/failed_items/processed_count) 只在事件循环线程中
+    # 读改写，中间没有 await，因此无需加锁
+
+    # 安静模式下不输出逐条日志，只保留分页进度、异常和汇总 (大批量导入时减少终端 I/O)
+    item_log = (lambda *args, **kwargs: None) if quiet else print
+
+    async def fetch_page(offset: int) -> List[Dict]:
+        async with http_sem:
+            return await fetch_prompts_from_api(client, limit=page_size, offset=offset)
+
+    async def producer():
+        nonlocal reached_end
+        page_num = start_page
+        # 下一页的预取任务: 处理本页 (详情/查重/入队) 时下一页请求已在进行
+        next_page: Optional[asyncio.Task] = None
         try:
-            items = fetch_prompts_from_api(limit=page_size, offset=offset)
-        except Exception as e:
-            print(f"   ❌ API 请求失败: {e}")
-            break
-
-        if not items:
-            print(f"   📭 没有更多数据")
-            break
-
-        stats["pages"] += 1
-        stats["items_found"] += len(items)
-        print(f"   找到 {len(items)} 条记录")
-
-        # 处理每个条目
-        for item in items:
-            item_id = item.get("id", "")
+            while True:
+                # 检查是否达到页数限制
+                if max_pages and page_num - start_page >= max_pages:
+                    print(f"\n📄 已达到最大页数 {max_pages}")
+                    break
+
+                # 检查是否达到数量限制
+                if limit and processed_count >= limit:
+                    print(f"\n📊 已达到数量限制 {limit}")
+                    break
+
+                # 通过 API 获取数据
+                offset = page_num * page_size
+                print(f"\n📄 获取第 {page_num + 1} 页 (offset={offset})...")
+                try:
+                    items = await (next_page or fetch_page(offset))
+                except Exception as e:
+                    print(f"   ❌ API 请求失败: {e}")
+                    break
+                finally:
+                    next_page = None
+
+                if not items:
+                    print(f"   📭 没有更多数据")
+                    reached_end = True
+                    break
+
+                if not (max_pages and page_num + 1 - start_page >= max_pages):
+                    next_page = asyncio.create_task(fetch_page(offset + page_size))
+
+                stats["pages"] += 1
+                stats["items_found"] += len(items)
+                print(f"   找到 {len(items)} 条记录")
+
+                # 检查是否已处理
+                done_ids = processed_ids.filter_processed([item.get("id", "") for item in items]) if resume else set()
+                pending = [item for item in items if item.get("id", "") not in done_ids]
+                page_pending[offset] = {item.get("id", "") for item in pending}
+                item_page.update(dict.fromkeys(page_pending[offset], offset))
+
+                # 获取详情（列表记录缺少 originUrl/prompts 时才需要单独获取）
+                detail_ids = [item.get("id", "") for item in pending if not has_full_data(item)]
+                details = dict(zip(detail_ids, await fetch_prompt_details(client, http_sem, detail_ids)))
+                if len(detail_ids) < len(pending):
+                    stats["detail_fetches_saved"] += len(pending) - len(detail_ids)
+                    print(f"   ⚡ 列表数据已完整，免去 {len(pending) - len(detail_ids)} 次详情请求")
+
+                candidates = []
+                for item in pending:
+                    item_id = item.get("id", "")
+                    detail = details.get(item_id) if item_id in details else item
+                    if not detail:
+                        item_log(f"   ⏭️ 跳过: 无法获取详情 (id={item_id[:8]}...)")
+                        continue
 
-            # 检查是否已处理
-            if resume and item_id in processed_ids:
-                continue
+                    # 提取数据
+                    api_data = extract_data_from_api_item(detail)
+                    if not api_data:
+                        item_log(f"   ⏭️ 跳过: 无 originUrl")
+                        continue
 
-            # 检查数量限制
-            if limit and processed_count >= limit:
-                break
+                    # 先做不需要网络的检查，避免为注定跳过的条目请求互动数据/Twitter
+                    if not api_data["prompt"] or not extract_tweet_info(api_data["x_url"])[0]:
+                        stats["skipped"] += 1
+                        reason = "无 prompt" if not api_data["prompt"] else "无效推文链接"
+                        item_log(f"   ⏭️ 跳过: {reason} (id={item_id[:8]}...)")
+                        mark_processed(item_id)
+                        continue
 
-            # 获取详情（列表 API 没有 originUrl，需要单独获取）
-            detail = fetch_prompt_detail(item_id)
-            if not detail:
-                print(f"   ⏭️ 跳过: 无法获取详情 (id={item_id[:8]}...)")
-                continue
+                    api_data["id"] = item_id
+                    candidates.append(api_data)
 
-            # 提取数据
-            api_data = extract_data_from_api_item(detail)
-            if not api_data:
-                print(f"   ⏭️ 跳过: 无 originUrl")
-                continue
+                # 过滤数据库中已存在的 URL (内存查重)，避免后续 Twitter/AI 调用
+                existing = {d["x_url"] for d in candidates if writer.prompt_exists(d["x_url"])}
 
-            processed_count += 1
-            title_display = api_data.get("title", "")[:40] or item_id[:20]
-            print(f"\n[{processed_count}] {title_display}")
-            print(f"   🔗 X: {api_data.get('x_url', '')[:60]}")
-
-            # 互动数过滤
-            if min_likes > 0 or min_retweets > 0:
-                x_url = api_data.get("x_url", "")
-                engagement = fetch_engagement_stats(x_url)
-                if engagement:
-                    likes = engagement.get("likes", 0)
-                    retweets = engagement.get("retweets", 0)
-                    print(f"   📊 互动: ❤️ {likes:,} | 🔁 {retweets:,}")
-
-                    passed, reason = check_engagement_threshold(engagement, min_likes, min_retweets)
-                    if not passed:
-                        stats["filtered"] += 1
-                        print(f"   ⏭️ 过滤: {reason}")
-                        # 记录已处理，避免重复检查
+                # 需要过滤互动数时，入队前就并发请求整页的互动数据，worker 取出时多半已完成
+                # (达到 limit 后的条目不会被处理，不再预取)
+                prefetch_budget = limit - processed_count if limit else len(candidates)
+                for api_data in candidates:
+                    x_url = api_data["x_url"]
+                    if x_url in existing or x_url in seen_urls:
+                        stats["skipped"] += 1
                         if not dry_run:
-                            processed_ids.add(item_id)
+                            mark_processed(api_data["id"])
                         continue
-                else:
-                    # 无法获取互动数据时跳过
+                    seen_urls.add(x_url)
+                    if filter_engagement and prefetch_budget > 0:
+                        api_data["_engagement"] = asyncio.create_task(fetch_engagement(x_url))
+                        prefetch_budget -= 1
+                    await queue.put(api_data)
+
+                if existing:
+                    print(f"   ⏭️ 已存在: {len(existing)} 条")
+
+                if quiet:
+                    print(f"   📊 已处理 {processed_count} 条 (成功 {stats['success']}, 失败 {stats['failed']})")
+
+                page_num += 1
+        finally:
+            # 提前结束 (达到 limit/出错) 时丢弃未使用的预取
+            if next_page:
+                next_page.cancel()
+                await asyncio.gather(next_page, return_exceptions=True)
+            # 每个 worker 一个结束标记
+            for _ in range(workers):
+                await queue.put(None)
+
+    async def process_item(api_data: Dict):
+        nonlocal processed_count
+        item_id = api_data.get("id", "")
+
+        # 检查与计数之间没有 await，并发时也不会超过 limit
+        if limit and processed_count >= limit:
+            if "_engagement" in api_data:
+                api_data["_engagement"].cancel()
+            return
+        processed_count += 1
+        n = processed_count
+
+        title_display = api_data.get("title", "")[:40] or item_id[:20]
+        item_log(f"\n[{n}] {title_display}")
+        item_log(f"   🔗 X: {api_data.get('x_url', '')[:60]}")
+
+        # 互动数过滤 (优先使用生产者预取的结果)
+        if filter_engagement:
+            prefetched = api_data.pop("_engagement", None)
+            if prefetched is not None:
+                engagement = await prefetched
+            else:
+                engagement = await fetch_engagement(api_data.get("x_url", ""))
+            if engagement:
+                likes = engagement.get("likes", 0)
+                retweets = engagement.get("retweets", 0)
+                item_log(f"   [{n}] 📊 互动: ❤️ {likes:,} | 🔁 {retweets:,}")
+
+                passed, reason = check_engagement_threshold(engagement, min_likes, min_retweets)
+                if not passed:
                     stats["filtered"] += 1
-                    print(f"   ⏭️ 过滤: 无法获取互动数据")
-                    continue
-
-            result = process_api_item(db, api_data, dry_run=dry_run)
-
-            # 记录 Twitter 处理失败
-            if result.get("twitter_failed"):
-                stats["twitter_failed"] += 1
+                    item_log(f"   [{n}] ⏭️ 过滤: {reason}")
+                    # 记录已处理，避免重复检查
+                    if not dry_run:
+                        mark_processed(item_id)
+                    return
+            else:
+                # 无法获取互动数据时跳过
+                stats["filtered"] += 1
+                item_log(f"   [{n}] ⏭️ 过滤: 无法获取互动数据")
+                return
+
+        result, prepared = await asyncio.to_thread(prepare_api_item, writer, api_data)
+        if prepared is None:
+            record_result(n, api_data, result)
+            return
+
+        # 交给分类阶段，本 worker 继续处理下一条
+        await classify_queue.put((n, api_data, result, prepared))
+
+    def record_result(n: int, api_data: Dict, result: Dict, source_link: Optional[str] = None):
+        item_id = api_data.get("id", "")
+
+        # 记录 Twitter 处理失败
+        if result.get("twitter_failed"):
+            stats["twitter_failed"] += 1
+            failed_items.append({
+                "id": item_id,
+                "x_url": api_data.get("x_url", ""),
+                "error": result.get("error", "Unknown")
+            })
+
+        if result["success"]:
+            stats["success"] += 1
+            if result["method"] == "dry_run":
+                item_log(f"   [{n}] ✅ 预览通过")
+            else:
+                item_log(f"   [{n}] ✅ 成功入库")
+        else:
+            if result["method"] == "skipped":
+                stats["skipped"] += 1
+                item_log(f"   [{n}] ⏭️ 跳过: {result['error']}")
+            elif result["method"] == "twitter_failed":
+                pass  # 已在上面记录
+            else:
+                stats["failed"] += 1
+                item_log(f"   [{n}] ❌ 失败: {result['error']}")
                 failed_items.append({
                     "id": item_id,
-                    "x_url": api_data.get("x_url", ""),
                     "error": result.get("error", "Unknown")
                 })
 
-            if result["success"]:
-                stats["success"] += 1
-                if result["method"] == "dry_run":
-                    print(f"   ✅ 预览通过")
-                else:
-                    print(f"   ✅ 成功入库")
+        # 保存进度 (已放入写入缓冲区的等写库成功后再记录)
+        if not dry_run:
+            if result["method"] == "imported" and source_link:
+                awaiting_flush[item_id] = source_link
             else:
-                if result["method"] == "skipped":
-                    stats["skipped"] += 1
-                    print(f"   ⏭️ 跳过: {result['error']}")
-                elif result["method"] == "twitter_failed":
-                    pass  # 已在上面记录
-                else:
-                    stats["failed"] += 1
-                    print(f"   ❌ 失败: {result['error']}")
-                    failed_items.append({
-                        "id": item_id,
-                        "error": result.get("error", "Unknown")
-                    })
-
-            # 保存进度
-            if not dry_run:
-                processed_ids.add(item_id)
-                if processed_count % 10 == 0:
-                    save_progress({"processed_slugs": list(processed_ids)})
-
-        page_num += 1
-
-    # 最终保存进度
-    if not dry_run:
-        save_progress({"processed_slugs": list(processed_ids)})
-
-    # 保存失败记录
-    failed_file = None
-    if failed_items and not dry_run:
-        failed_file = save_failed_items(failed_items, timestamp)
+                mark_processed(item_id)
+
+    def record_error(api_data: Dict, error: Exception):
+        stats["failed"] += 1
+        print(f"   ❌ 处理异常 (id={api_data.get('id', '')[:8]}...): {error}")
+        failed_items.append({
+            "id": api_data.get("id", ""),
+            "error": str(error)
+        })
+
+    async def worker():
+        while (item := await queue.get()) is not None:
+            try:
+                await process_item(item)
+            except Exception as e:
+                record_error(item, e)
+
+    async def prepare_stage():
+        try:
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            for _ in range(CLASSIFY_WORKERS):
+                await classify_queue.put(None)
+
+    async def classify_batch(batch: List[tuple]):
+        prompts = [prepared["prompt"] for _, _, _, prepared in batch]
+        try:
+            classifications = await asyncio.to_thread(classify_for_import_batch, prompts, AI_MODEL)
+        except Exception as e:
+            print(f"   ⚠️ AI 分类失败: {e}")
+            classifications = [{}] * len(batch)
+
+        for (n, api_data, result, prepared), classification in zip(batch, classifications):
+            try:
+                result = await asyncio.to_thread(
+                    finalize_tweet_import, writer, result, prepared, classification,
+                    import_source="aiart_pics", dry_run=dry_run
+                )
+            except Exception as e:
+                record_error(api_data, e)
+                continue
+            record_result(n, api_data, result, prepared["tweet_url"])
+
+    async def classify_stage():
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            job = await classify_queue.get()
+            if job is None:
+                break
+
+            # 攒批: 达到批量大小、等待超时或收到结束标记时发出请求
+            batch = [job]
+            deadline = loop.time() + CLASSIFY_BATCH_WAIT
+            while len(batch) < CLASSIFY_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(classify_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if job is None:
+                    finished = True
+                    break
+                batch.append(job)
+
+            await classify_batch(batch)
+
+    # SIGTERM 时取消流水线，走下面的 finally 写入缓冲区剩余记录
+    loop = asyncio.get_running_loop()
+    if sys.platform != "win32":
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+    # 写库只在单线程池中进行，避免与结束时的 flush 同时使用同一数据库连接
+    db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aiart-db")
+    flusher = asyncio.create_task(
+        writer_flush_stage(writer, WRITER_POLL_INTERVAL, db_executor, on_flush=release_flushed)
+    )
+    progress_writer = asyncio.create_task(
+        batch_queue_stage(progress_queue, processed_ids.add_many, PROGRESS_BATCH_SIZE)
+    )
+    try:
+        await asyncio.gather(producer(), prepare_stage(),
+                             *(classify_stage() for _ in range(CLASSIFY_WORKERS)))
+    except asyncio.CancelledError:
+        print("\n⚠️ 收到终止信号，写入剩余记录后退出")
+    finally:
+        if sys.platform != "win32":
+            loop.remove_signal_handler(signal.SIGTERM)
+        flusher.cancel()
+        progress_writer.cancel()
+        await asyncio.gather(flusher, progress_writer, return_exceptions=True)
+        await client.aclose()
+        # 等待进行中的写入完成，再写入缓冲区剩余记录 (包括中断时)
+        db_executor.shutdown(wait=True)
+        writer.flush()
+        release_flushed()
+        drain_queue(progress_queue, processed_ids.add_many, PROGRESS_BATCH_SIZE)
+        if resume_offset and not dry_run:
+            save_resume_offset()
+        processed_ids.close(touch=not dry_run)
+        failed_file = failed_items.close()
 
     # 输出统计
     print("\n" + "=" * 70)
@@ -460,6 +914,10 @@ def run_import(limit: int = None, max_pages: int = None, dry_run: bool = False,
         print(f"📊 过滤 (互动不足): {stats['filtered']}")
     print(f"❌ 失败: {stats['failed']}")
     print(f"⚠️ Twitter 失败: {stats['twitter_failed']}")
+    if stats['detail_fetches_saved'] > 0:
+        print(f"⚡ 免去详情请求: {stats['detail_fetches_saved']}")
+    if writer.failed:
+        print(f"💾 批量写入失败: {writer.failed}")
 
     if failed_file:
         print(f"\n📁 失败记录已保存: {failed_file}")
@@ -469,6 +927,29 @@ def run_import(limit: int = None, max_pages: int = None, dry_run: bool = False,
     db.close()
 
 
+def run_import(limit: int = None, max_pages: int = None, dry_run: bool = False,
+               resume: bool = True, reset_progress: bool = False,
+               min_likes: int = DEFAULT_MIN_LIKES, min_retweets: int = DEFAULT_MIN_RETWEETS,
+               workers: int = DEFAULT_WORKERS, use_cache: bool = True,
+               bulk_mode: bool = False, quiet: bool = False, resume_offset: bool = False):
+    """导入流程 (同步入口)，安装了 uvloop 时使用 uvloop 事件循环"""
+    run = uvloop.run if HAS_UVLOOP else asyncio.run
+    run(run_import_async(
+        limit=limit,
+        max_pages=max_pages,
+        dry_run=dry_run,
+        resume=resume,
+        reset_progress=reset_progress,
+        min_likes=min_likes,
+        min_retweets=min_retweets,
+        workers=workers,
+        use_cache=use_cache,
+        bulk_mode=bulk_mode,
+        quiet=quiet,
+        resume_offset=resume_offset
+    ))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="从 AIART.PICS 导入数据到数据库 (API)",
@@ -507,8 +988,16 @@ def main():
                         help=f"最低点赞数过滤 (默认: {DEFAULT_MIN_LIKES}, 0=不过滤)")
     parser.add_argument("--min-retweets", type=int, default=DEFAULT_MIN_RETWEETS,
                         help=f"最低转发数过滤 (默认: {DEFAULT_MIN_RETWEETS}, 0=不过滤)")
+    parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS,
+                        help=f"并发处理数 (默认: {DEFAULT_WORKERS})")
+    parser.add_argument("--no-cache", action="store_true", help="禁用推文/分类结果缓存")
+    parser.add_argument("--bulk-mode", action="store_true",
+                        help=f"全量回填模式: 每 {BULK_SAVE_BATCH_SIZE} 条用 COPY 写入一次")
+    parser.add_argument("--quiet", "-q", action="store_true", help="不输出逐条日志，只显示分页进度和汇总")
     parser.add_argument("--dry-run", "-d", action="store_true", help="预览模式")
     parser.add_argument("--no-resume", action="store_true", help="禁用断点续传")
+    parser.add_argument("--resume-offset", action="store_true",
+                        help="归档回填: 从上次未处理完的列表页继续 (默认每次从第 1 页开始)")
     parser.add_argument("--reset", action="store_true", help="重置进度")
 
     args = parser.parse_args()
@@ -521,7 +1010,12 @@ def main():
             resume=not args.no_resume,
             reset_progress=args.reset,
             min_likes=args.min_likes,
-            min_retweets=args.min_retweets
+            min_retweets=args.min_retweets,
+            workers=args.workers,
+            use_cache=not args.no_cache,
+            bulk_mode=args.bulk_mode,
+            quiet=args.quiet,
+            resume_offset=args.resume_offset
         )
     except KeyboardInterrupt:
         print("\n\n⚠️ 用户中断，进度已保存")
@@ -17,12 +17,21 @@
 """
 
 import argparse
-import json
+import asyncio
 import os
+import re
 import sys
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
+
+# ijson (可选，流式解析大数据文件)
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
 
 # 加载环境变量
 try:
@@ -42,8 +51,18 @@ except ImportError:
     pass
 
 # 导入主模块
-from main import Database, AI_MODEL
-from prompt_utils import process_tweet_for_import
+from main import AI_MODEL, BufferedPromptWriter, Database
+from prompt_utils import (
+    FailedItemsLog,
+    batch_queue_stage,
+    drain_queue,
+    json_dumps_bytes,
+    json_loads,
+    now_iso,
+    process_tweet_for_import,
+    write_json_atomic,
+    writer_flush_stage,
+)
 
 # ========== 配置 ==========
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
@@ -51,20 +70,48 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "")
 # 数据文件
 CACHE_DIR = Path(__file__).parent / "cache"
 X_URLS_FILE = CACHE_DIR / "aiart_pics_x_urls.json"
-PROGRESS_FILE = CACHE_DIR / "aiart_x_urls_import_progress.json"
+# 进度文件: 每处理一条追加一行 {"slug", "ts"}
+PROGRESS_FILE = CACHE_DIR / "aiart_x_urls_import_progress.jsonl"
+# 进度快照 (整个列表存为一个 JSON，兼容旧版进度文件)，加载时与追加日志合并
+PROGRESS_SNAPSHOT_FILE = CACHE_DIR / "aiart_x_urls_import_progress.json"
+# 追加日志超过该行数时，加载后合并进快照并清空日志
+PROGRESS_COMPACT_LINES = 1000
+
+# 推文链接格式 (处理前预检查)
+X_STATUS_URL_RE = re.compile(r"^https?://(?:www\.)?(?:x|twitter)\.com/[^/]+/status/\d+")
+
+# 同时处理的条目数 (Twitter/AI 调用都是阻塞 I/O，在线程池中执行)
+ITEM_CONCURRENCY = 8
+# 写入阶段检查缓冲区的间隔 (秒)
+WRITER_POLL_INTERVAL = 0.2
+# 进度日志每批最多写入的条数
+PROGRESS_BATCH_SIZE = 50
 
 # 失败记录
 FAILED_OUTPUT_DIR = Path(__file__).parent / "failed_imports"
 
 
 def load_x_urls_data() -> Optional[Dict]:
-    """加载 x_urls 数据"""
+    """
+    加载 x_urls 数据
+    安装了 ijson 时逐条流式解析 items，只保留有 x_url 的记录 (不把整个文件读入内存)，
+    total/with_x_url 在解析过程中计数
+    """
     if not X_URLS_FILE.exists():
         print(f"❌ 文件不存在: {X_URLS_FILE}")
         return None
 
-    with open(X_URLS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    if HAS_IJSON:
+        total = 0
+        items = []
+        with open(X_URLS_FILE, "rb") as f:
+            for item in ijson.items(f, "items.item", use_float=True):
+                total += 1
+                if item.get("x_url"):
+                    items.append(item)
+        data = {"total": total, "with_x_url": len(items), "items": items}
+    else:
+        data = json_loads(X_URLS_FILE.read_bytes())
 
     print(f"📦 已加载: {X_URLS_FILE}")
     print(f"   总记录: {data.get('total', 0)}")
@@ -74,56 +121,93 @@ def load_x_urls_data() -> Optional[Dict]:
 
 
 def load_progress() -> Dict:
-    """加载处理进度"""
+    """
+    加载处理进度 (JSON 快照 + 逐行追加的进度日志)，日志过长时顺带压缩
+    processed_slugs 直接累积为 set，调用方无需再转换一遍
+    """
+    progress = {"processed_slugs": set(), "last_updated": None}
+    if PROGRESS_SNAPSHOT_FILE.exists():
+        try:
+            snapshot = json_loads(PROGRESS_SNAPSHOT_FILE.read_bytes())
+            progress["processed_slugs"].update(snapshot.get("processed_slugs", ()))
+            progress["last_updated"] = snapshot.get("last_updated")
+        except Exception as e:
+            print(f"⚠️ 读取进度快照失败: {e}")
+
+    log_lines = 0
+    bad_lines = 0
     if PROGRESS_FILE.exists():
         try:
             with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            pass
-    return {"processed_slugs": [], "last_updated": None}
+                for line in f:
+                    if not line.strip():
+                        continue
+                    # 中途崩溃可能留下写了一半的行，跳过它继续读取后面的记录
+                    try:
+                        entry = json_loads(line)
+                        slug = entry["slug"]
+                    except Exception:
+                        bad_lines += 1
+                        continue
+                    progress["processed_slugs"].add(slug)
+                    progress["last_updated"] = entry.get("ts")
+                    log_lines += 1
+        except Exception as e:
+            print(f"⚠️ 读取进度失败: {e}")
+            return progress
+        if bad_lines:
+            print(f"⚠️ 进度日志中有 {bad_lines} 行不完整，已跳过")
+
+    if log_lines >= PROGRESS_COMPACT_LINES:
+        compact_progress(progress)
+
+    return progress
+
+
+def compact_progress(progress: Dict):
+    """把追加日志合并进快照 (原子写入)，然后清空日志"""
+    try:
+        write_json_atomic(PROGRESS_SNAPSHOT_FILE, progress, default=list)
+        PROGRESS_FILE.unlink()
+    except Exception as e:
+        print(f"⚠️ 压缩进度失败: {e}")
 
 
-def save_progress(progress: Dict):
-    """保存处理进度"""
+def open_progress_log():
+    """以追加模式打开进度文件 (行缓冲，每条写入后立即落盘)"""
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    progress["last_updated"] = datetime.now(timezone.utc).isoformat()
-
+    progress_log = open(PROGRESS_FILE, "a", encoding="utf-8", buffering=1)
+    # 上次中途崩溃时最后一行可能没有换行，先补上，避免新记录接在残行后面
+    if PROGRESS_FILE.stat().st_size > 0:
+        with open(PROGRESS_FILE, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                progress_log.write("\n")
+    return progress_log
+
+
+def append_progress(progress_log, slugs: List[str]):
+    """追加一批已处理记录 (一次写入)"""
+    ts = now_iso()
+    lines = [json_dumps_bytes({"slug": slug, "ts": ts}).decode("utf-8") + "\n" for slug in slugs]
     try:
-        with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(progress, f, ensure_ascii=False, indent=2)
+        progress_log.write("".join(lines))
     except Exception as e:
         print(f"⚠️ 保存进度失败: {e}")
 
 
 def clear_progress():
     """清除处理进度"""
-    if PROGRESS_FILE.exists():
-        PROGRESS_FILE.unlink()
+    removed = False
+    for path in (PROGRESS_FILE, PROGRESS_SNAPSHOT_FILE):
+        if path.exists():
+            path.unlink()
+            removed = True
+    if removed:
         print("🗑️ 已清除处理进度")
 
 
-def save_failed_items(failed_items: list, timestamp: str) -> Optional[Path]:
-    """保存失败记录"""
-    if not failed_items:
-        return None
-
-    FAILED_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    filepath = FAILED_OUTPUT_DIR / f"aiart_x_urls_failed_{timestamp}.json"
-
-    output = {
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-        "total": len(failed_items),
-        "items": failed_items
-    }
-
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
-
-    return filepath
-
-
-def process_item(db: Database, item: Dict, dry_run: bool = False) -> Dict[str, Any]:
+def process_item(db, item: Dict, dry_run: bool = False) -> Dict[str, Any]:
     """
     处理单个条目
 
@@ -134,6 +218,10 @@ def process_item(db: Database, item: Dict, dry_run: bool = False) -> Dict[str, A
     if not x_url:
         return {"success": False, "method": "skipped", "error": "No x_url", "twitter_failed": False}
 
+    # 格式不对的链接必然失败，不再请求 Twitter
+    if not X_STATUS_URL_RE.match(x_url):
+        return {"success": False, "method": "skipped", "error": "Invalid x_url", "twitter_failed": False}
+
     # 使用统一处理函数
     result = process_tweet_for_import(
         db=db,
@@ -146,6 +234,112 @@ def process_item(db: Database, item: Dict, dry_run: bool = False) -> Dict[str, A
     return result
 
 
+async def process_items(writer: BufferedPromptWriter, items: List[Dict], stats: Dict,
+                        failed_items: FailedItemsLog, progress_log, dry_run: bool = False):
+    """
+    并发处理所有条目: 每条在线程池中执行 process_item，最多 ITEM_CONCURRENCY 条同时进行
+    (Twitter 请求速率由 fetch_twitter_content 的令牌桶统一限制)；
+    缓冲的入库记录由写入阶段在单独的数据库线程中定期写入
+    """
+    total = len(items)
+    sem = asyncio.Semaphore(ITEM_CONCURRENCY)
+    done = 0
+
+    # 处理线程池与并发上限一致；写库只在单线程池中进行，避免多个线程争用同一数据库连接
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=ITEM_CONCURRENCY, thread_name_prefix="x_urls"))
+    db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="x_urls-db")
+
+    # 本次运行中已分派的 x_url (只在事件循环线程中读写)
+    seen_urls = set()
+
+    # 已处理 slug 先入队，由 batch_queue_stage 攒批后一次追加写入
+    progress_queue: asyncio.Queue = asyncio.Queue()
+
+    def write_progress(slugs: List[str]):
+        append_progress(progress_log, slugs)
+
+    # 记录已进入写入缓冲区的条目 (slug -> x_url)，写库成功后才记录进度；
+    # 写入失败的条目不记录，下次运行重新处理
+    awaiting_flush: Dict[str, str] = {}
+
+    def release_flushed():
+        for slug, x_url in list(awaiting_flush.items()):
+            if writer.is_pending(x_url):
+                continue
+            del awaiting_flush[slug]
+            if x_url not in writer.failed_links:
+                progress_queue.put_nowait(slug)
+
+    async def handle(item: Dict):
+        nonlocal done
+        slug = item.get("slug", "?")
+        x_url = item.get("x_url", "")
+
+        # 同一 x_url 只处理第一次出现的条目: 并发时后面的条目会在前一条入库前通过查重，导致重复写入
+        if x_url and x_url in seen_urls:
+            result = {"success": False, "method": "skipped", "error": "Already exists", "twitter_failed": False}
+        else:
+            seen_urls.add(x_url)
+            async with sem:
+                try:
+                    result = await asyncio.to_thread(process_item, writer, item, dry_run)
+                except Exception as e:
+                    result = {"success": False, "method": "error", "error": str(e), "twitter_failed": False}
+
+        # 以下在事件循环线程中执行，无需加锁
+        done += 1
+        print(f"[{done}/{total}] ({done / total * 100:.1f}%) {slug[:50]}")
+        if x_url:
+            print(f"   🔗 {x_url}")
+
+        if result.get("twitter_failed"):
+            stats["twitter_failed"] += 1
+            failed_items.append({
+                "slug": slug,
+                "x_url": x_url,
+                "error": result.get("error", "Unknown")
+            })
+
+        if result["success"]:
+            stats["success"] += 1
+            print(f"   ✅ 成功入库")
+        else:
+            if result["method"] == "skipped":
+                stats["skipped"] += 1
+                print(f"   ⏭️ 跳过: {result['error']}")
+            elif result["method"] == "twitter_failed":
+                print(f"   ❌ Twitter 失败: {result['error']}")
+            else:
+                stats["failed"] += 1
+                print(f"   ❌ 失败: {result['error']}")
+
+        # 保存进度 (已放入写入缓冲区的等写库成功后再记录)
+        if progress_log:
+            if result["method"] == "imported":
+                awaiting_flush[slug] = x_url
+            else:
+                progress_queue.put_nowait(slug)
+
+        print()
+
+    flusher = asyncio.create_task(
+        writer_flush_stage(writer, WRITER_POLL_INTERVAL, db_executor, on_flush=release_flushed)
+    )
+    progress_writer = asyncio.create_task(batch_queue_stage(progress_queue, write_progress, PROGRESS_BATCH_SIZE))
+    try:
+        await asyncio.gather(*(handle(item) for item in items))
+    finally:
+        flusher.cancel()
+        progress_writer.cancel()
+        await asyncio.gather(flusher, progress_writer, return_exceptions=True)
+        # 等待进行中的写入完成，再写入缓冲区剩余记录 (包括中断时)，之后才能确定哪些条目已入库
+        db_executor.shutdown(wait=True)
+        writer.flush()
+        release_flushed()
+        drain_queue(progress_queue, write_progress, PROGRESS_BATCH_SIZE)
+
+
 def run_import(limit: int = None, dry_run: bool = False,
                resume: bool = True, reset_progress: bool = False):
     """运行导入流程"""
@@ -173,23 +367,27 @@ def run_import(limit: int = None, dry_run: bool = False,
     if not data:
         sys.exit(1)
 
-    items = data.get("items", [])
-
-    # 只处理有 x_url 的
-    items = [item for item in items if item.get("x_url")]
-    print(f"📊 有 x_url 的记录: {len(items)}")
-
-    # 加载进度
-    progress = load_progress()
-    processed_slugs = set(progress.get("processed_slugs", []))
-
-    if resume and processed_slugs:
-        original_count = len(items)
-        items = [item for item in items if item.get("slug") not in processed_slugs]
-        skipped = original_count - len(items)
-        if skipped > 0:
-            print(f"📊 已处理（跳过）: {skipped}")
-            print(f"   上次更新: {progress.get('last_updated', 'N/A')}")
+    # 加载进度 (不续传时不需要已处理集合)
+    progress = load_progress() if resume else {}
+    skip_slugs = progress.get("processed_slugs", set())
+
+    # 一次遍历同时过滤无 x_url 和已处理的记录，不生成中间列表
+    with_x_url = 0
+    items = []
+    for item in data.get("items", []):
+        if not item.get("x_url"):
+            continue
+        with_x_url += 1
+        if item.get("slug") not in skip_slugs:
+            items.append(item)
+    print(f"📊 有 x_url 的记录: {with_x_url}")
+
+    skipped = with_x_url - len(items)
+    if skipped > 0:
+        print(f"📊 已处理（跳过）: {skipped}")
+        print(f"   上次更新: {progress.get('last_updated', 'N/A')}")
+    # 过滤完成后不再需要已处理集合，导入期间不继续占用内存
+    del progress, skip_slugs
 
     # 限制数量
     if limit:
@@ -221,54 +419,20 @@ def run_import(limit: int = None, dry_run: bool = False,
         "twitter_failed": 0,
     }
 
-    failed_items = []
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # 失败记录逐条追加写入，中断时已记录的不会丢失
+    failed_items = FailedItemsLog(FAILED_OUTPUT_DIR / f"aiart_x_urls_failed_{timestamp}.jsonl",
+                                  enabled=not dry_run)
+    progress_log = open_progress_log() if not dry_run else None
+    # 多个线程同时处理，入库记录先缓冲，由 process_items 的写入阶段批量写入
+    writer = BufferedPromptWriter(db, auto_flush=False)
+    # 一次加载已有链接，之后的查重都在内存中完成
+    print(f"📊 已有链接: {writer.preload_existing()} 条\n")
 
     try:
-        for i, item in enumerate(items, 1):
-            slug = item.get("slug", "?")
-            x_url = item.get("x_url", "")
-
-            progress_pct = (i / total) * 100
-            print(f"[{i}/{total}] ({progress_pct:.1f}%) {slug[:50]}")
-            if x_url:
-                print(f"   🔗 {x_url}")
-
-            result = process_item(db, item, dry_run=dry_run)
-
-            if result.get("twitter_failed"):
-                stats["twitter_failed"] += 1
-                failed_items.append({
-                    "slug": slug,
-                    "x_url": x_url,
-                    "error": result.get("error", "Unknown")
-                })
-
-            if result["success"]:
-                stats["success"] += 1
-                print(f"   ✅ 成功入库")
-            else:
-                if result["method"] == "skipped":
-                    stats["skipped"] += 1
-                    print(f"   ⏭️ 跳过: {result['error']}")
-                elif result["method"] == "twitter_failed":
-                    print(f"   ❌ Twitter 失败: {result['error']}")
-                else:
-                    stats["failed"] += 1
-                    print(f"   ❌ 失败: {result['error']}")
-
-            # 保存进度
-            if not dry_run:
-                processed_slugs.add(slug)
-                if i % 10 == 0 or i == total:
-                    save_progress({"processed_slugs": list(processed_slugs)})
-
-            print()
-
-        # 保存失败记录
-        failed_file = None
-        if failed_items and not dry_run:
-            failed_file = save_failed_items(failed_items, timestamp)
+        asyncio.run(process_items(writer, items, stats, failed_items, progress_log, dry_run))
+
+        failed_file = failed_items.close()
 
         # 输出统计
         print("=" * 70)
@@ -279,6 +443,8 @@ def run_import(limit: int = None, dry_run: bool = False,
         print(f"⏭️ 跳过: {stats['skipped']}")
         print(f"❌ 失败: {stats['failed']}")
         print(f"⚠️ Twitter 失败: {stats['twitter_failed']}")
+        if writer.failed:
+            print(f"💾 批量写入失败: {writer.failed}")
 
         if failed_file:
             print(f"\n📁 失败记录已保存: {failed_file}")
@@ -286,6 +452,11 @@ def run_import(limit: int = None, dry_run: bool = False,
         print("=" * 70)
 
     finally:
+        # 写入缓冲区剩余记录 (包括中断时)
+        writer.flush()
+        if progress_log:
+            progress_log.close()
+        failed_items.close()
         db.close()
 
 
@@ -17,18 +17,27 @@ OpenNana Prompt Gallery 导入脚本
   python import_opennana.py --limit 10         # 限制导入数量
   python import_opennana.py --skip-twitter     # 跳过 Twitter 处理，直接用原始数据
   python import_opennana.py --dry-run          # 预览模式，不写入数据库
+  python import_opennana.py --workers 8        # 8 条同时处理
 """
 
 import argparse
-import json
+import heapq
 import os
 import re
+import sqlite3
 import sys
-from datetime import datetime, timezone
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
-import requests
+# ijson (可选，流式解析本地缓存)
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
 
 # 加载环境变量
 try:
@@ -48,30 +57,133 @@ except ImportError:
     pass
 
 # 导入主模块的数据库类和处理函数
-from main import Database, AI_MODEL
+from main import AI_MODEL, BufferedPromptWriter, Database
 
 # AI 处理适配函数 (统一使用 prompt_utils)
-from prompt_utils import process_tweet_for_import
+from prompt_utils import (
+    FailedItemsLog,
+    json_dumps_bytes,
+    json_loads,
+    now_iso,
+    process_tweet_for_import,
+    thread_log_prefix,
+    thread_prefixed_output,
+)
+
+# 共享的 requests.Session (连接池复用，并发请求不重复 TLS 握手)
+from fetch_twitter_content import get_session
 
 # ========== 配置 ==========
 # 新 API 端点
 OPENNANA_API_BASE = "https://api.opennana.com/api/prompts"
 OPENNANA_LIST_API = OPENNANA_API_BASE  # GET ?page=1&limit=20&sort=created_at&order=DESC
 # 详情 API: GET https://api.opennana.com/api/prompts/{slug}
+# 列表和详情请求共用的请求头 (gzip、连接复用由共享 Session 提供)
+OPENNANA_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+    "Referer": "https://opennana.com/",
+    "Origin": "https://opennana.com",
+}
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
 
 # 数据缓存目录
 CACHE_DIR = Path(__file__).parent / "cache"
 PROMPTS_CACHE_FILE = CACHE_DIR / "prompts.json"
+# 列表/详情响应的 ETag / Last-Modified 及响应体，--refresh 时用于条件请求
+HTTP_CACHE_DB = CACHE_DIR / "http_cache.sqlite"
+# 已处理 ID 存放在 sqlite 中，逐条插入，无需启动时加载或定期重写整个文件
+PROGRESS_DB = CACHE_DIR / "import_progress.sqlite"
+# 旧版 JSON 进度文件，首次打开 PROGRESS_DB 时迁移
 PROGRESS_FILE = CACHE_DIR / "import_progress.json"
 
+# 同时进行的详情请求数
+DETAIL_FETCH_WORKERS = 16
+
+# 默认同时处理的条目数 (抓取推文 + AI 分类)
+DEFAULT_WORKERS = 4
+
 # 失败记录输出目录
 FAILED_OUTPUT_DIR = Path(__file__).parent / "failed_imports"
 
 # 分类由 process_tweet_for_import 统一处理，无需单独导入标签映射
 
 
+class HttpCache:
+    """
+    OpenNana 响应的 ETag / Last-Modified 缓存 (sqlite)
+    再次请求时带上条件请求头，服务端返回 304 说明内容未变，直接复用本地保存的响应体
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # 列表页和详情在线程池中并发获取，连接跨线程共用，由锁串行化访问
+        self.conn = sqlite3.connect(path or HTTP_CACHE_DB, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS http_cache (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB)"
+            )
+
+    def lookup(self, url: str) -> Optional[tuple]:
+        """返回 (etag, last_modified, body)，没有缓存时返回 None"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified, body FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body) VALUES (?, ?, ?, ?)",
+                (url, etag, last_modified, body),
+            )
+
+
+_http_cache: Optional[HttpCache] = None
+_http_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> HttpCache:
+    """获取模块共享的 HttpCache"""
+    global _http_cache
+    if _http_cache is None:
+        with _http_cache_lock:
+            if _http_cache is None:
+                _http_cache = HttpCache()
+    return _http_cache
+
+
+def get_json(url: str) -> Dict:
+    """
+    GET 并解析 JSON 响应
+    之前的响应带有 ETag / Last-Modified 时发送条件请求，304 时返回缓存的响应体
+    """
+    cache = get_http_cache()
+    cached = cache.lookup(url)
+    headers = OPENNANA_HEADERS
+    if cached:
+        etag, last_modified, _ = cached
+        headers = dict(OPENNANA_HEADERS)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    response = get_session().get(url, timeout=30, headers=headers)
+    if cached and response.status_code == 304:
+        return json_loads(cached[2])
+    response.raise_for_status()
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        cache.store(url, etag, last_modified, response.content)
+    return json_loads(response.content)
+
+
 def fetch_prompt_list(page: int = 1, limit: int = 100) -> Optional[Dict]:
     """
     获取 prompt 列表（单页）
@@ -86,13 +198,7 @@ def fetch_prompt_list(page: int = 1, limit: int = 100) -> Optional[Dict]:
     url = f"{OPENNANA_LIST_API}?page={page}&limit={limit}&sort=created_at&order=DESC"
 
     try:
-        response = requests.get(url, timeout=30, headers={
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-            "Referer": "https://opennana.com/",
-            "Origin": "https://opennana.com"
-        })
-        response.raise_for_status()
-        data = response.json()
+        data = get_json(url)
 
         if data.get("status") == 200:
             return data.get("data", {})
@@ -117,13 +223,7 @@ def fetch_prompt_detail(slug: str) -> Optional[Dict]:
     url = f"{OPENNANA_API_BASE}/{slug}"
 
     try:
-        response = requests.get(url, timeout=30, headers={
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-            "Referer": "https://opennana.com/",
-            "Origin": "https://opennana.com"
-        })
-        response.raise_for_status()
-        data = response.json()
+        data = get_json(url)
 
         if data.get("status") == 200:
             return data.get("data", {})
@@ -134,19 +234,31 @@ def fetch_prompt_detail(slug: str) -> Optional[Dict]:
         return None
 
 
-def fetch_opennana_data(force_refresh: bool = False, fetch_details: bool = True, max_items: int = None, max_pages: int = 2, page_size: int = 20) -> Optional[Dict]:
+def iter_cached_items():
+    """逐条读取本地缓存中的条目 (安装了 ijson 时流式解析，不把整个文件读入内存)"""
+    with open(PROMPTS_CACHE_FILE, "rb") as f:
+        if HAS_IJSON:
+            yield from ijson.items(f, "items.item", use_float=True)
+        else:
+            yield from json_loads(f.read()).get("items", [])
+
+
+def fetch_opennana_data(force_refresh: bool = False, fetch_details: bool = True, max_items: int = None, max_pages: int = 2, page_size: int = 20,
+                        item_filter: Optional[Callable[[Dict], bool]] = None) -> Optional[Dict]:
     """
     从 OpenNana 新 API 获取数据，支持本地缓存
 
     Args:
-        force_refresh: 强制从远程获取，忽略本地缓存
+        force_refresh: 强制从远程获取列表，本地缓存中已有完整详情的条目不再重复请求详情
         fetch_details: 是否获取详情（用于完整导入）
         max_items: 最大获取数量（用于测试），None 表示不限制
         max_pages: 最大获取页数（默认 2）
         page_size: 每页获取数量（默认 20）
+        item_filter: 只保留返回 True 的条目；命中缓存且安装了 ijson 时在流式解析中过滤，
+                     不把整个缓存文件读入内存
 
     Returns:
-        格式化的数据: {"total": int, "items": [...]}
+        格式化的数据: {"total": int, "items": [...]}，total 为过滤前的条目数
     """
     # 创建缓存目录
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
@@ -154,10 +266,13 @@ def fetch_opennana_data(force_refresh: bool = False, fetch_details: bool = True,
     # 检查本地缓存
     if not force_refresh and PROMPTS_CACHE_FILE.exists():
         try:
-            with open(PROMPTS_CACHE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            total = data.get("total", len(data.get("items", [])))
+            total = 0
+            items = []
+            for item in iter_cached_items():
+                total += 1
+                if item_filter is None or item_filter(item):
+                    items.append(item)
+            data = {"total": total, "items": items}
             cache_time = PROMPTS_CACHE_FILE.stat().st_mtime
             cache_date = datetime.fromtimestamp(cache_time).strftime("%Y-%m-%d %H:%M:%S")
 
@@ -170,90 +285,132 @@ def fetch_opennana_data(force_refresh: bool = False, fetch_details: bool = True,
         except Exception as e:
             print(f"⚠️ 读取缓存失败: {e}，重新获取...")
 
+    # --refresh 且已有缓存时，缓存中已有完整详情的条目不再请求详情，只获取新增 (或上次获取失败) 的
+    cached_items = {}
+    if force_refresh and fetch_details and PROMPTS_CACHE_FILE.exists():
+        try:
+            cached_items = {item["id"]: item for item in iter_cached_items()
+                            if item.get("id") is not None and item.get("prompts")}
+        except Exception as e:
+            print(f"⚠️ 读取缓存失败: {e}，重新获取全部详情...")
+            cached_items = {}
+
     # 从新 API 获取数据
     print(f"📡 正在从新 API 获取数据...")
     print(f"   列表 API: {OPENNANA_LIST_API}")
     print(f"   配置: max_pages={max_pages}, page_size={page_size}")
 
     all_items = []
-    page = 1
     limit = page_size  # 每页获取数量
 
-    # 1. 先获取所有列表数据
-    while True:
-        print(f"   📄 获取列表第 {page} 页...")
-        list_data = fetch_prompt_list(page=page, limit=limit)
-
-        if not list_data:
-            break
-
+    # 列表页与详情共用一个线程池
+    detail_futures = []
+
+    with ThreadPoolExecutor(max_workers=DETAIL_FETCH_WORKERS) as executor:
+        def add_page(items: List[Dict]) -> bool:
+            """
+            接收一页列表条目 (截断到 max_items)，并立即提交其中需要获取详情的请求，
+            详情与后续列表页同时进行，不必等整个列表获取完。返回是否已达到 max_items
+            """
+            if max_items:
+                items = items[:max_items - len(all_items)]
+            all_items.extend(items)
+            if fetch_details:
+                for item in items:
+                    if item.get("slug") and item.get("id") not in cached_items:
+                        detail_futures.append(executor.submit(fetch_prompt_detail, item["slug"]))
+            return bool(max_items) and len(all_items) >= max_items
+
+        # 1. 先获取第 1 页拿到总页数，再并发获取剩余列表页
+        print(f"   📄 获取列表第 1 页...")
+        list_data = fetch_prompt_list(page=1, limit=limit) or {}
         items = list_data.get("items", [])
         pagination = list_data.get("pagination", {})
 
-        if not items:
-            break
-
-        all_items.extend(items)
-
-        total_pages = pagination.get("total_pages", 1)
-        has_more = pagination.get("has_more", False)
-
-        print(f"      获取到 {len(items)} 条，共 {pagination.get('total', '?')} 条")
-
-        # 如果设置了最大数量限制，检查是否达到
-        if max_items and len(all_items) >= max_items:
-            all_items = all_items[:max_items]
+        reached_max_items = False
+        if items:
+            print(f"      获取到 {len(items)} 条，共 {pagination.get('total', '?')} 条")
+            reached_max_items = add_page(items)
+
+            last_page = pagination.get("total_pages", 1) if pagination.get("has_more", False) else 1
+            # 如果设置了最大页数限制，只取前 max_pages 页
+            if max_pages and last_page > max_pages:
+                last_page = max_pages
+                print(f"   ⚡ 达到最大页数限制 ({max_pages} 页)，停止获取列表")
+            # 如果设置了最大数量限制，只取凑够 max_items 所需的页数
+            if max_items:
+                last_page = min(last_page, -(-max_items // limit))
+
+            if last_page > 1 and not reached_max_items:
+                print(f"   📄 并发获取列表第 2-{last_page} 页...")
+                pages = range(2, last_page + 1)
+                for page, list_data in zip(pages, executor.map(lambda p: fetch_prompt_list(page=p, limit=limit), pages)):
+                    items = (list_data or {}).get("items", [])
+                    # 与逐页获取一致：遇到失败或空页即停止，不拼接其后的页
+                    if not items:
+                        break
+                    print(f"      第 {page} 页获取到 {len(items)} 条")
+                    if add_page(items):
+                        reached_max_items = True
+                        break
+
+        if reached_max_items:
             print(f"   ⚡ 达到最大数量限制 ({max_items})，停止获取列表")
-            break
-
-        # 如果设置了最大页数限制，检查是否达到
-        if max_pages and page >= max_pages:
-            print(f"   ⚡ 达到最大页数限制 ({max_pages} 页)，停止获取列表")
-            break
-
-        if not has_more or page >= total_pages:
-            break
-
-        page += 1
 
-    if not all_items:
-        print("❌ 未获取到任何数据")
-        return None
+        if not all_items:
+            print("❌ 未获取到任何数据")
+            return None
 
-    print(f"✅ 列表获取完成: 共 {len(all_items)} 条")
-
-    # 2. 获取详情（如果需要）
-    if fetch_details:
-        print(f"📡 正在获取详情...")
-        detailed_items = []
-
-        for i, item in enumerate(all_items, 1):
-            slug = item.get("slug")
-            if not slug:
-                continue
-
-            if i % 50 == 0 or i == len(all_items):
-                print(f"   进度: {i}/{len(all_items)}")
-
-            detail = fetch_prompt_detail(slug)
-            if detail:
-                # 转换为兼容旧格式的数据结构
-                converted = convert_to_legacy_format(detail)
-                detailed_items.append(converted)
-            else:
-                # 详情获取失败，使用列表中的基础数据
-                detailed_items.append({
-                    "id": item.get("id"),
-                    "slug": slug,
-                    "title": item.get("title", "Untitled"),
-                    "images": [item.get("cover_image")] if item.get("cover_image") else [],
-                    "prompts": [],
-                    "tags": [],
-                    "source": None
-                })
-
-        all_items = detailed_items
-        print(f"✅ 详情获取完成: {len(detailed_items)} 条")
+        print(f"✅ 列表获取完成: 共 {len(all_items)} 条")
+
+        # 2. 收集详情（请求已在接收列表页时提交）
+        if fetch_details:
+            print(f"📡 正在获取详情 (并发 {DETAIL_FETCH_WORKERS})...")
+            detailed_items = []
+            items_with_slug = [item for item in all_items if item.get("slug")]
+            total_fetch = len(detail_futures)
+            if cached_items:
+                print(f"   缓存中已有 {len(items_with_slug) - total_fetch} 条详情，只获取 {total_fetch} 条")
+
+            # 详情请求按提交顺序与需要获取的条目一一对应
+            details = (future.result() for future in detail_futures)
+            fetched = 0
+            for item in items_with_slug:
+                cached = cached_items.get(item.get("id"))
+                if cached is not None:
+                    detailed_items.append(cached)
+                    continue
+
+                detail = next(details)
+                fetched += 1
+                if fetched % 50 == 0 or fetched == total_fetch:
+                    print(f"   进度: {fetched}/{total_fetch}")
+
+                if detail:
+                    # 转换为兼容旧格式的数据结构
+                    converted = convert_to_legacy_format(detail)
+                    detailed_items.append(converted)
+                else:
+                    # 详情获取失败，使用列表中的基础数据
+                    detailed_items.append({
+                        "id": item.get("id"),
+                        "slug": item["slug"],
+                        "title": item.get("title", "Untitled"),
+                        "images": [item.get("cover_image")] if item.get("cover_image") else [],
+                        "prompts": [],
+                        "tags": [],
+                        "source": None
+                    })
+
+            # 不在本次列表范围内的缓存条目继续保留
+            listed_ids = {item.get("id") for item in items_with_slug}
+            unlisted = [cached for item_id, cached in cached_items.items() if item_id not in listed_ids]
+            if unlisted:
+                detailed_items.extend(unlisted)
+                print(f"   保留本次列表之外的缓存条目: {len(unlisted)} 条")
+
+            all_items = detailed_items
+            print(f"✅ 详情获取完成: {len(detailed_items)} 条")
 
     # 构建返回数据
     result = {
@@ -263,16 +420,19 @@ def fetch_opennana_data(force_refresh: bool = False, fetch_details: bool = True,
 
     # 保存到本地缓存
     try:
-        with open(PROMPTS_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        with open(PROMPTS_CACHE_FILE, "wb") as f:
+            f.write(json_dumps_bytes(result, indent=True))
         print(f"💾 已缓存到: {PROMPTS_CACHE_FILE}")
     except Exception as e:
         print(f"⚠️ 保存缓存失败: {e}")
 
+    if item_filter is not None:
+        result["items"] = [item for item in all_items if item_filter(item)]
+
     return result
 
 
-def convert_to_legacy_format(detail: Dict) -> Dict:
+def convert_to_legacy_format(detail: Dict[str, Any]) -> Dict[str, Any]:
     """
     将新 API 的详情数据转换为兼容旧格式的数据结构
 
@@ -289,28 +449,28 @@ def convert_to_legacy_format(detail: Dict) -> Dict:
         - images: [string] 数组 (相对路径)
         - tags: [string] 数组
     """
-    # 提取提示词文本（优先英文，否则中文）
+    # 提取提示词文本（优先英文，否则取第一条有文本的，一次遍历）
     prompts_data = detail.get("prompts", [])
-    prompt_texts = []
+    prompt_text = None
 
-    # 优先使用英文提示词
     for p in prompts_data:
-        if p.get("type") == "en" and p.get("text"):
-            prompt_texts.append(p["text"])
+        text = p.get("text")
+        if not text:
+            continue
+        if p.get("type") == "en":
+            prompt_text = text
             break
+        if prompt_text is None:
+            prompt_text = text
 
-    # 如果没有英文，使用中文
-    if not prompt_texts:
-        for p in prompts_data:
-            if p.get("text"):
-                prompt_texts.append(p["text"])
-                break
+    prompt_texts = [prompt_text] if prompt_text else []
 
     # 构建 source 对象
     source = None
-    if detail.get("source_url"):
+    source_url = detail.get("source_url")
+    if source_url:
         source = {
-            "url": detail.get("source_url"),
+            "url": source_url,
             "name": detail.get("source_name", "")
         }
 
@@ -328,52 +488,107 @@ def convert_to_legacy_format(detail: Dict) -> Dict:
     }
 
 
-def load_progress() -> Dict:
-    """加载处理进度"""
-    if PROGRESS_FILE.exists():
-        try:
-            with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            pass
-    return {"processed_ids": [], "last_updated": None}
-
+class ProgressStore:
+    """已处理条目 ID 的 sqlite 存储 (WAL 模式，逐条写入即持久化，无需每次重写整个进度文件)"""
 
-def save_progress(progress: Dict):
-    """保存处理进度"""
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    progress["last_updated"] = datetime.now(timezone.utc).isoformat()
-    
-    try:
-        with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(progress, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"⚠️ 保存进度失败: {e}")
+    # 单条 IN 查询的最大 ID 数，低于 sqlite 的参数数量上限
+    QUERY_CHUNK_SIZE = 500
 
+    def __init__(self, path: Optional[Path] = None):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path or PROGRESS_DB, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS progress (id INTEGER PRIMARY KEY)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._migrate_json_progress()
 
-def clear_progress():
-    """清除处理进度"""
-    if PROGRESS_FILE.exists():
+    def _migrate_json_progress(self):
+        """导入旧版 JSON 进度文件，成功后删除旧文件"""
+        if not PROGRESS_FILE.exists():
+            return
+        try:
+            progress = json_loads(PROGRESS_FILE.read_bytes())
+        except Exception as e:
+            print(f"⚠️ 迁移旧版进度文件失败: {e}")
+            return
+
+        ids = progress.get("processed_ids", [])
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO progress (id) VALUES (?)", ((i,) for i in ids))
+            if progress.get("last_updated"):
+                self._set_meta("last_updated", progress["last_updated"])
         PROGRESS_FILE.unlink()
+        print(f"📦 已迁移旧版进度文件: {len(ids)} 条")
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM progress").fetchone()[0]
+
+    def filter_processed(self, item_ids: List[int]) -> set:
+        """返回 item_ids 中已处理的 ID 集合 (按主键分批查询，不加载整张表)"""
+        processed = set()
+        for start in range(0, len(item_ids), self.QUERY_CHUNK_SIZE):
+            chunk = item_ids[start:start + self.QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(f"SELECT id FROM progress WHERE id IN ({placeholders})", chunk)
+            processed.update(row[0] for row in rows)
+        return processed
+
+    def add_many(self, item_ids: List[int]):
+        """在一个事务中记录多条已处理条目"""
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO progress (id) VALUES (?)", ((i,) for i in item_ids))
+
+    @property
+    def last_updated(self) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'last_updated'").fetchone()
+        return row[0] if row else None
+
+    def clear(self):
+        """清除处理进度"""
+        self.conn.execute("DELETE FROM progress")
+        self.conn.execute("DELETE FROM meta")
         print("🗑️ 已清除处理进度")
 
+    def close(self, touch: bool = False):
+        """关闭存储，touch=True 时记录本次更新时间"""
+        if touch:
+            self._set_meta("last_updated", now_iso(0))
+        self.conn.close()
+
 
-def extract_twitter_url(source: Dict) -> Optional[str]:
+TWITTER_STATUS_URL_RE = re.compile(r"https?://(?:www\.)?(twitter\.com|x\.com)/\w+/status/\d+")
+
+
+def extract_twitter_url(source: Optional[Dict[str, Any]]) -> Optional[str]:
     """从 source 对象中提取 Twitter/X URL"""
     if not source:
         return None
     
-    url = source.get("url", "")
+    url = source.get("url") or ""
     
     # 检查是否是 Twitter/X 链接
-    if re.match(r"https?://(?:www\.)?(?:twitter\.com|x\.com)/\w+/status/\d+", url):
-        # 标准化为 x.com
-        return url.replace("twitter.com", "x.com")
+    match = TWITTER_STATUS_URL_RE.match(url)
+    if not match:
+        return None
     
-    return None
+    # 标准化为 x.com (已是 x.com 时原样返回，只替换域名部分)
+    if match.group(1) == "twitter.com":
+        url = url.replace("twitter.com", "x.com", 1)
+    return url
 
 
-def process_opennana_item(db: Database, item: Dict, skip_twitter: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+def item_twitter_url(item: Dict[str, Any]) -> Optional[str]:
+    """条目的 Twitter/X URL，首次提取后缓存在 item["_twitter_url"]，过滤、日志和处理共用一次解析结果"""
+    if "_twitter_url" not in item:
+        item["_twitter_url"] = extract_twitter_url(item.get("source"))
+    return item["_twitter_url"]
+
+
+def process_opennana_item(db: BufferedPromptWriter, item: Dict, skip_twitter: bool = False, dry_run: bool = False) -> Dict[str, Any]:
     """
     处理单个 OpenNana 条目 - 使用统一处理函数
 
@@ -383,10 +598,8 @@ def process_opennana_item(db: Database, item: Dict, skip_twitter: bool = False,
 
     返回: {"success": bool, "method": str, "error": str or None, "twitter_failed": bool}
     """
-    source = item.get("source") or {}
-
     # 提取 Twitter URL
-    twitter_url = extract_twitter_url(source)
+    twitter_url = item_twitter_url(item)
 
     # 获取原始提示词
     prompts = item.get("prompts", [])
@@ -412,43 +625,10 @@ def process_opennana_item(db: Database, item: Dict, skip_twitter: bool = False,
     return result
 
 
-def save_failed_twitter_items(failed_twitter_items: List[Dict], timestamp: str):
-    """保存 Twitter 处理失败的条目到文件供人工处理"""
-    if not failed_twitter_items:
-        return None
-    
-    # 创建输出目录
-    FAILED_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    
-    # 生成文件名
-    filename = f"twitter_failed_{timestamp}.json"
-    filepath = FAILED_OUTPUT_DIR / filename
-    
-    # 保存为 JSON 文件
-    output_data = {
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-        "total": len(failed_twitter_items),
-        "description": "Twitter 图片获取失败的条目（未入库）",
-        "instructions": [
-            "这些条目的 Twitter 图片获取失败，未入库",
-            "人工处理步骤:",
-            "1. 访问 twitter_url 获取高清图片 URL",
-            "2. 手动入库或使用脚本处理",
-            "3. 或使用 --skip-twitter 跳过 Twitter 处理，直接用 OpenNana 图片入库"
-        ],
-        "items": failed_twitter_items
-    }
-    
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
-    
-    return filepath
-
-
 def run_import(limit: int = None, skip_twitter: bool = False, dry_run: bool = False,
                only_twitter: bool = False, start_id: int = None, force_refresh: bool = False,
                resume: bool = True, reset_progress: bool = False,
-               max_pages: int = 2, page_size: int = 20):
+               max_pages: int = 2, page_size: int = 20, workers: int = DEFAULT_WORKERS):
     """
     运行导入流程
 
@@ -463,6 +643,7 @@ def run_import(limit: int = None, skip_twitter: bool = False, dry_run: bool = Fa
         reset_progress: 重置进度
         max_pages: 最大获取页数
         page_size: 每页获取数量
+        workers: 同时处理的条目数
     """
     print("=" * 70)
     print("📦 OpenNana Prompt Gallery 导入")
@@ -473,64 +654,67 @@ def run_import(limit: int = None, skip_twitter: bool = False, dry_run: bool = Fa
     print(f"仅处理有 X 来源的: {only_twitter}")
     print(f"预览模式: {dry_run}")
     print(f"断点续传: {resume}")
+    print(f"并发数: {workers}")
     if limit:
         print(f"限制数量: {limit}")
     if start_id:
         print(f"起始 ID: {start_id}")
     print("=" * 70)
     
+    processed_ids = ProgressStore()
+
     # 重置进度
     if reset_progress:
-        clear_progress()
+        processed_ids.clear()
     
     # 检查配置
     if not DATABASE_URL:
         print("❌ 缺少 DATABASE_URL 环境变量")
+        processed_ids.close()
         sys.exit(1)
     
+    # 仅处理有 Twitter 来源的 / 从指定 ID 开始：读取数据时就过滤，不保留被排除的条目
+    def keep_item(item: Dict) -> bool:
+        if only_twitter and not item_twitter_url(item):
+            return False
+        return not start_id or item.get("id", 0) >= start_id
+
     # 获取数据（支持缓存）
-    data = fetch_opennana_data(force_refresh=force_refresh, max_pages=max_pages, page_size=page_size)
+    data = fetch_opennana_data(force_refresh=force_refresh, max_pages=max_pages, page_size=page_size,
+                               item_filter=keep_item if only_twitter or start_id else None)
     if not data:
+        processed_ids.close()
         sys.exit(1)
     
-    items = data.get("items", [])
+    candidates = data.get("items", [])
+    del data
     
-    # 如果只处理有 Twitter 来源的
     if only_twitter:
-        items = [item for item in items if extract_twitter_url(item.get("source"))]
-        print(f"📊 有 X 来源的条目: {len(items)}")
-    
-    # 按 ID 从小到大排序
-    items = sorted(items, key=lambda x: x.get("id", 0))
-    print(f"📊 按 ID 升序排列")
-    
-    # 如果指定了起始 ID
-    if start_id:
-        items = [item for item in items if item.get("id", 0) >= start_id]
-        print(f"📊 ID >= {start_id} 的条目: {len(items)}")
+        print(f"📊 有 X 来源的条目: {len(candidates)}" + (f" (ID >= {start_id})" if start_id else ""))
+    elif start_id:
+        print(f"📊 ID >= {start_id} 的条目: {len(candidates)}")
     
-    # 加载进度，过滤已处理的条目
-    progress = load_progress()
-    processed_ids = set(progress.get("processed_ids", []))
+    # 已处理的条目 (只查询本次候选 ID，不加载整个进度表)
+    done = set()
+    if resume:
+        done = processed_ids.filter_processed([item["id"] for item in candidates if item.get("id") is not None])
+        if done:
+            print(f"📊 已处理（跳过）: {len(done)}")
+            print(f"   上次更新: {processed_ids.last_updated or 'N/A'}")
     
-    if resume and processed_ids:
-        original_count = len(items)
-        items = [item for item in items if item.get("id") not in processed_ids]
-        skipped_count = original_count - len(items)
-        
-        if skipped_count > 0:
-            print(f"📊 已处理（跳过）: {skipped_count}")
-            print(f"   上次更新: {progress.get('last_updated', 'N/A')}")
-    
-    # 限制数量
-    if limit:
-        items = items[:limit]
+    # 排除已处理条目并按 ID 从小到大排序，一次完成；限制数量时只保留最小的 limit 条，不排序全部
+    pending = (item for item in candidates if item.get("id") not in done)
+    sort_key = lambda x: x.get("id", 0)
+    items = heapq.nsmallest(limit, pending, key=sort_key) if limit else sorted(pending, key=sort_key)
+    del candidates, done
+    print(f"📊 按 ID 升序排列")
     
     total_items = len(items)
     print(f"\n🔄 准备处理 {total_items} 条记录...\n")
     
     if total_items == 0:
         print("✅ 没有需要处理的记录")
+        processed_ids.close()
         return
     
     # 连接数据库
@@ -541,8 +725,16 @@ def run_import(limit: int = None, skip_twitter: bool = False, dry_run: bool = Fa
         print("✅ 数据库连接成功\n")
     except Exception as e:
         print(f"❌ 数据库连接失败: {e}")
+        processed_ids.close()
         sys.exit(1)
     
+    # 入库记录先缓冲，攒够一批 (或超过刷新间隔) 后一次写入，代替逐条 INSERT+提交
+    # 先写库再记进度，中断时不会出现已记进度但未入库的条目
+    writer = BufferedPromptWriter(db, auto_flush=False)
+    # 多个线程同时查重，一次加载已有链接，之后的查重都在内存中完成
+    print(f"📊 已有链接: {writer.preload_existing()} 条\n")
+    pending_ids = []
+    
     # 统计
     stats = {
         "total": len(items),
@@ -555,134 +747,163 @@ def run_import(limit: int = None, skip_twitter: bool = False, dry_run: bool = Fa
     }
     
     failed_items = []
-    failed_twitter_items = []  # Twitter 处理失败的条目
     
     # 生成时间戳
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    # 定期刷新失败文件的间隔（每 20 条）
-    FLUSH_INTERVAL = 20
-    failed_file = None
+    # Twitter 处理失败的条目逐条追加到 JSONL 文件，内存中只保留计数，中断时已记录的不会丢失
+    failed_twitter_items = FailedItemsLog(FAILED_OUTPUT_DIR / f"twitter_failed_{timestamp}.jsonl",
+                                          enabled=not dry_run)
     
-    try:
-        for i, item in enumerate(items, 1):
-            item_id = item.get("id", "?")
-            title = item.get("title", "Untitled")[:40]
-            source = item.get("source") or {}
-            twitter_url = extract_twitter_url(source)
+    # 条目处理 (抓取推文 + AI 分类) 在线程池中并发进行，
+    # 主线程按原顺序取结果，负责统计、日志、批量写库和记录进度
+    # 同一推文只处理第一次出现的条目: 并发时后面的条目会在前一条入库前通过查重，导致重复写入
+    seen_urls = set()
+    for item in items:
+        twitter_url = item_twitter_url(item)
+        if twitter_url and item.get("prompts"):
+            item["_duplicate"] = twitter_url in seen_urls
+            seen_urls.add(twitter_url)
+    del seen_urls
+
+    def process(item: Dict) -> Dict[str, Any]:
+        if item.get("_duplicate"):
+            return {"success": False, "method": "skipped", "error": "Already exists", "twitter_failed": False}
+        with thread_log_prefix(f"[ID={item.get('id', '?')}]"):
+            return process_opennana_item(writer, item, skip_twitter=skip_twitter, dry_run=dry_run)
+
+    # 工作线程中的输出按行加上条目 ID 前缀，与其它条目交错时仍能对应
+    with thread_prefixed_output():
+        workers = max(1, workers)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="opennana")
+        results = executor.map(process, items)
+    
+        try:
+            for i, (item, result) in enumerate(zip(items, results), 1):
+                item_id = item.get("id", "?")
+                title = item.get("title", "Untitled")[:40]
+                twitter_url = item_twitter_url(item)
             
-            # 显示进度条
-            progress_pct = (i / total_items) * 100
-            print(f"[{i}/{total_items}] ({progress_pct:.1f}%) ID={item_id}: {title}")
+                # 本条的输出先收集起来，处理完后一次写出，减少 stdout 写入次数
+                log = []
             
-            if twitter_url:
-                print(f"   🔗 X: {twitter_url}")
+                # 显示进度条
+                progress_pct = (i / total_items) * 100
+                log.append(f"[{i}/{total_items}] ({progress_pct:.1f}%) ID={item_id}: {title}")
             
-            result = process_opennana_item(db, item, skip_twitter=skip_twitter, dry_run=dry_run)
-            stats["processed"] += 1
+                if twitter_url:
+                    log.append(f"   🔗 X: {twitter_url}")
             
-            # 记录 Twitter 处理失败的条目
-            if result.get("twitter_failed"):
-                stats["twitter_failed"] += 1
-
-                # 新 API 返回的是完整图片 URL
-                images = item.get("images", [])
+                stats["processed"] += 1
+            
+                # 记录 Twitter 处理失败的条目
+                if result.get("twitter_failed"):
+                    stats["twitter_failed"] += 1
+
+                    # 新 API 返回的是完整图片 URL
+                    images = item.get("images", [])
+                    prompts = item.get("prompts")
+                    full_prompt = prompts[0] if prompts else None
                 
-                failed_twitter_items.append({
-                    "id": item_id,
-                    "title": item.get("title", "Untitled"),
-                    "twitter_url": twitter_url,
-                    "error": result.get("twitter_error", "Unknown error"),
-                    "saved_to_db": result.get("success", False),  # 是否已入库（使用备用图片）
-                    # 用于人工处理的关键数据
-                    "prompt_preview": (item.get("prompts", [""])[0][:200] + "...") if item.get("prompts") else None,
-                    "full_prompt": item.get("prompts", [""])[0] if item.get("prompts") else None,  # 完整提示词
-                    "images": images[:5],  # 保留前5张图片URL
-                    "tags": item.get("tags", []),
-                    "model": item.get("model"),
-                    "source_name": (item.get("source") or {}).get("name"),
-                })
+                    failed_twitter_items.append({
+                        "id": item_id,
+                        "title": item.get("title", "Untitled"),
+                        "twitter_url": twitter_url,
+                        "error": result.get("twitter_error", "Unknown error"),
+                        "saved_to_db": result.get("success", False),  # 是否已入库（使用备用图片）
+                        # 用于人工处理的关键数据
+                        "prompt_preview": (full_prompt[:200] + "...") if prompts else None,
+                        "full_prompt": full_prompt,  # 完整提示词
+                        "images": images[:5],  # 保留前5张图片URL
+                        "tags": item.get("tags", []),
+                        "model": item.get("model"),
+                        "source_name": (item.get("source") or {}).get("name"),
+                    })
             
-            if result["success"]:
-                if result["method"] == "hybrid":
-                    stats["success_twitter"] += 1
-                    print(f"   ✅ 成功入库 (Twitter图片+AI分类)")
-                elif result["method"] == "json_direct":
-                    stats["success_json"] += 1
-                    print(f"   ✅ 成功入库 (OpenNana图片+AI分类)")
-                elif result["method"] == "dry_run":
-                    print(f"   ✅ 预览通过")
-            else:
-                if result["method"] == "skipped":
-                    stats["skipped"] += 1
-                    print(f"   ⏭️ 跳过: {result['error']}")
-                elif result["method"] == "twitter_failed":
-                    # Twitter 失败，不入库，记录到文件
-                    print(f"   📝 记录到失败文件 (Twitter图片获取失败)")
-                elif result["method"] == "save_failed":
-                    stats["failed"] += 1
-                    failed_items.append({"id": item_id, "title": title, "error": result["error"]})
-                    print(f"   ❌ 保存失败: {result['error']}")
+                method = result["method"]
+                if result["success"]:
+                    if method == "hybrid":
+                        stats["success_twitter"] += 1
+                        log.append(f"   ✅ 成功入库 (Twitter图片+AI分类)")
+                    elif method == "json_direct":
+                        stats["success_json"] += 1
+                        log.append(f"   ✅ 成功入库 (OpenNana图片+AI分类)")
+                    elif method == "dry_run":
+                        log.append(f"   ✅ 预览通过")
                 else:
-                    stats["failed"] += 1
-                    failed_items.append({"id": item_id, "title": title, "error": result["error"]})
-                    print(f"   ❌ 失败: {result['error']}")
-            
-            # 保存进度（每处理一条就保存，支持中断续传）
-            if not dry_run and item_id != "?":
-                processed_ids.add(item_id)
-                # 每处理 10 条保存一次进度，减少 IO
-                if i % 10 == 0 or i == total_items:
-                    save_progress({"processed_ids": list(processed_ids)})
+                    if method == "skipped":
+                        stats["skipped"] += 1
+                        log.append(f"   ⏭️ 跳过: {result['error']}")
+                    elif method == "twitter_failed":
+                        # Twitter 失败，不入库，记录到文件
+                        log.append(f"   📝 记录到失败文件 (Twitter图片获取失败)")
+                    elif method == "save_failed":
+                        stats["failed"] += 1
+                        failed_items.append({"id": item_id, "title": title, "error": result["error"]})
+                        log.append(f"   ❌ 保存失败: {result['error']}")
+                    else:
+                        stats["failed"] += 1
+                        failed_items.append({"id": item_id, "title": title, "error": result["error"]})
+                        log.append(f"   ❌ 失败: {result['error']}")
             
-            # 定期刷新失败文件（每 FLUSH_INTERVAL 条或最后一条）
-            if not dry_run and failed_twitter_items and (i % FLUSH_INTERVAL == 0 or i == total_items):
-                failed_file = save_failed_twitter_items(failed_twitter_items, timestamp)
-                print(f"   💾 已刷新失败记录到文件 ({len(failed_twitter_items)} 条)")
+                # 记录进度（本批入库后再写入 sqlite，支持中断续传）
+                if not dry_run and item_id != "?":
+                    pending_ids.append(item_id)
+                    if writer.due() or i == total_items:
+                        writer.flush()
+                        processed_ids.add_many(pending_ids)
+                        pending_ids.clear()
             
-            print()
+                print("\n".join(log) + "\n")
         
-        # 最终保存 Twitter 处理失败的条目到文件
-        if failed_twitter_items and not dry_run:
-            failed_file = save_failed_twitter_items(failed_twitter_items, timestamp)
+            failed_file = failed_twitter_items.close()
         
-        # 输出统计
-        print("=" * 70)
-        print("📊 导入完成 - 统计汇总")
-        print("=" * 70)
-        print(f"\n总计: {stats['total']}")
-        print(f"已处理: {stats['processed']}")
-        print(f"✅ 成功 (Twitter): {stats['success_twitter']}")
-        print(f"✅ 成功 (JSON): {stats['success_json']}")
-        print(f"⏭️ 跳过: {stats['skipped']}")
-        print(f"❌ 失败: {stats['failed']}")
-        print(f"⚠️ Twitter 处理失败: {stats['twitter_failed']}")
-        
-        if failed_items:
-            print("\n" + "=" * 70)
-            print("❌ 完全失败的条目:")
+            # 输出统计
             print("=" * 70)
-            for item in failed_items[:10]:
-                print(f"   ID={item['id']}: {item['title']}")
-                print(f"   错误: {item['error']}")
-                print()
-            if len(failed_items) > 10:
-                print(f"   ... 还有 {len(failed_items) - 10} 条失败记录")
-        
-        # 显示失败文件信息
-        if failed_file:
-            print("\n" + "=" * 70)
-            print("📁 Twitter 图片获取失败的条目已保存:")
+            print("📊 导入完成 - 统计汇总")
             print("=" * 70)
-            print(f"   文件: {failed_file}")
-            print(f"   数量: {len(failed_twitter_items)}")
-            print(f"   说明: 这些条目未入库，需要人工处理")
-            print(f"         或使用 --skip-twitter 跳过 Twitter 直接入库")
+            print(f"\n总计: {stats['total']}")
+            print(f"已处理: {stats['processed']}")
+            print(f"✅ 成功 (Twitter): {stats['success_twitter']}")
+            print(f"✅ 成功 (JSON): {stats['success_json']}")
+            print(f"⏭️ 跳过: {stats['skipped']}")
+            print(f"❌ 失败: {stats['failed']}")
+            print(f"⚠️ Twitter 处理失败: {stats['twitter_failed']}")
+            if writer.failed:
+                print(f"💾 批量写入失败: {writer.failed}")
+        
+            if failed_items:
+                print("\n" + "=" * 70)
+                print("❌ 完全失败的条目:")
+                print("=" * 70)
+                for item in failed_items[:10]:
+                    print(f"   ID={item['id']}: {item['title']}")
+                    print(f"   错误: {item['error']}")
+                    print()
+                if len(failed_items) > 10:
+                    print(f"   ... 还有 {len(failed_items) - 10} 条失败记录")
         
-        print("\n" + "=" * 70)
+            # 显示失败文件信息
+            if failed_file:
+                print("\n" + "=" * 70)
+                print("📁 Twitter 图片获取失败的条目已保存:")
+                print("=" * 70)
+                print(f"   文件: {failed_file}")
+                print(f"   数量: {failed_twitter_items.count}")
+                print(f"   说明: 这些条目未入库，需要人工处理")
+                print(f"         或使用 --skip-twitter 跳过 Twitter 直接入库")
+        
+            print("\n" + "=" * 70)
         
-    finally:
-        db.close()
+        finally:
+            # 中断时取消尚未开始的条目，写入已缓冲的记录，并补记这些条目的进度
+            executor.shutdown(wait=True, cancel_futures=True)
+            failed_twitter_items.close()
+            writer.flush()
+            if pending_ids:
+                processed_ids.add_many(pending_ids)
+            db.close()
+            processed_ids.close(touch=not dry_run)
 
 
 def main():
@@ -714,7 +935,8 @@ def main():
 
 缓存文件:
   worker/cache/prompts.json        - JSON 数据缓存
-  worker/cache/import_progress.json - 处理进度
+  worker/cache/import_progress.sqlite - 处理进度
+  worker/cache/http_cache.sqlite   - 列表/详情响应的 ETag 缓存 (条件请求)
         """
     )
     
@@ -737,6 +959,8 @@ def main():
                         help="最大获取页数 (默认: 2)")
     parser.add_argument("--page-size", type=int, default=20,
                         help="每页获取数量 (默认: 20)")
+    parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS,
+                        help=f"并发处理数 (默认: {DEFAULT_WORKERS})")
 
     args = parser.parse_args()
 
@@ -750,7 +974,8 @@ def main():
         resume=not args.no_resume,
         reset_progress=args.reset,
         max_pages=args.max_pages,
-        page_size=args.page_size
+        page_size=args.page_size,
+        workers=args.workers
     )
 
 
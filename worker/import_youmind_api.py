@@ -22,7 +22,7 @@ import argparse
 import json
 import os
 import sys
-from datetime import datetime, timezone
+from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
@@ -46,10 +46,13 @@ except ImportError:
     pass
 
 # 导入主模块的数据库类和处理函数
-from main import Database, AI_MODEL
+from main import AI_MODEL, BufferedPromptWriter, Database
 
 # AI 处理适配函数 (统一使用 prompt_utils)
-from prompt_utils import process_tweet_for_import
+from prompt_utils import now_iso, process_tweet_for_import, write_json_atomic
+
+# 共享的 requests.Session (连接池复用，翻页不重复 TLS 握手)
+from fetch_twitter_content import get_session
 
 # ========== 配置 ==========
 YOUMIND_API_URL = "https://youmind.com/youhome-api/prompts"
@@ -60,6 +63,8 @@ IMPORT_SOURCE = "youmind"  # 导入来源标识
 CACHE_DIR = Path(__file__).parent / "cache"
 YOUMIND_CACHE_FILE = CACHE_DIR / "youmind_prompts.json"
 PROGRESS_FILE = CACHE_DIR / "youmind_import_progress.json"
+# 进度文件 last_updated 时间戳的最小刷新间隔（秒）
+PROGRESS_TIMESTAMP_INTERVAL = 60
 
 # 失败记录输出目录
 FAILED_OUTPUT_DIR = Path(__file__).parent / "failed_imports"
@@ -89,7 +94,6 @@ def fetch_youmind_page(page: int = 1, limit: int = 30) -> Optional[Dict]:
         "Content-Type": "application/json",
         "Accept": "application/json, text/plain, */*",
         "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
         "Origin": "https://youmind.com",
         "Referer": "https://youmind.com/nano-banana-pro-prompts",
@@ -103,7 +107,8 @@ def fetch_youmind_page(page: int = 1, limit: int = 30) -> Optional[Dict]:
 
     try:
         print(f"📡 请求 API: page={page}, limit={limit}")
-        response = requests.post(YOUMIND_API_URL, json=payload, headers=headers, timeout=30)
+        # Accept-Encoding 使用会话默认值 (gzip, deflate)；未安装 brotli 时 requests 无法解码 br
+        response = get_session().post(YOUMIND_API_URL, json=payload, headers=headers, timeout=30)
         response.raise_for_status()
 
         data = response.json()
@@ -273,19 +278,21 @@ def load_progress() -> Dict:
         try:
             with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
                 return json.load(f)
-        except Exception:
-            pass
+        except Exception as e:
+            # 进度文件是原子写入的，读取失败说明文件异常，提示后从头开始
+            print(f"⚠️ 读取进度失败，将从头处理: {e}")
     return {"processed_ids": [], "last_updated": None}
 
 
-def save_progress(progress: Dict):
-    """保存处理进度"""
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    progress["last_updated"] = datetime.now(timezone.utc).isoformat()
+def save_progress(progress: Dict, last_updated: Optional[str] = None):
+    """
+    保存处理进度（last_updated 由调用方传入，缓存目录在 run_import 启动时创建）
+    processed_ids 可以直接传 set，序列化时才转换，不额外复制一份列表
+    """
+    progress["last_updated"] = last_updated or now_iso()
 
     try:
-        with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(progress, f, ensure_ascii=False, indent=2)
+        write_json_atomic(PROGRESS_FILE, progress, default=list)
     except Exception as e:
         print(f"⚠️ 保存进度失败: {e}")
 
@@ -316,7 +323,7 @@ def save_failed_twitter_items(failed_twitter_items: List[Dict], timestamp: str):
 
     # 保存为 JSON 文件
     output_data = {
-        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "generated_at": now_iso(),
         "total": len(failed_twitter_items),
         "description": "Twitter 图片获取失败的条目（未入库）",
         "instructions": [
@@ -335,7 +342,7 @@ def save_failed_twitter_items(failed_twitter_items: List[Dict], timestamp: str):
     return filepath
 
 
-def process_youmind_item(db: Database, item: Dict, skip_twitter: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+def process_youmind_item(db, item: Dict, skip_twitter: bool = False, dry_run: bool = False) -> Dict[str, Any]:
     """
     处理单个 YouMind 提示词 - 使用统一处理函数
 
@@ -357,7 +364,7 @@ def process_youmind_item(db: Database, item: Dict, skip_twitter: bool = False, d
     twitter_url = item.get("sourceLink")
     # 标准化为 x.com
     if twitter_url and "twitter.com" in twitter_url:
-        twitter_url = twitter_url.replace("twitter.com", "x.com")
+        twitter_url = twitter_url.replace("twitter.com", "x.com", 1)
 
     # 必须有 Twitter URL
     if not twitter_url:
@@ -417,6 +424,7 @@ def run_import(limit: int = None, dry_run: bool = False, force_refresh: bool = F
         sys.exit(1)
 
     # 加载进度，过滤已处理的条目
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
     progress = load_progress()
     processed_ids = set(progress.get("processed_ids", []))
 
@@ -450,6 +458,10 @@ def run_import(limit: int = None, dry_run: bool = False, force_refresh: bool = F
         print(f"❌ 数据库连接失败: {e}")
         sys.exit(1)
 
+    # 入库记录先缓冲，每次保存进度前批量写入 (一次 INSERT 代替逐条写入+提交)
+    # 先写库再记进度，中断时不会出现已记进度但未入库的条目
+    writer = BufferedPromptWriter(db, auto_flush=False)
+
     # 统计
     stats = {
         "total": len(prompts),
@@ -476,7 +488,7 @@ def run_import(limit: int = None, dry_run: bool = False, force_refresh: bool = F
             title = item.get("title", "Untitled")[:40]
             twitter_url = item.get("sourceLink")
             if twitter_url and "twitter.com" in twitter_url:
-                twitter_url = twitter_url.replace("twitter.com", "x.com")
+                twitter_url = twitter_url.replace("twitter.com", "x.com", 1)
 
             # 显示进度条
             progress_pct = (i / total_items) * 100
@@ -485,7 +497,7 @@ def run_import(limit: int = None, dry_run: bool = False, force_refresh: bool = F
             if twitter_url:
                 print(f"   🔗 X: {twitter_url}")
 
-            result = process_youmind_item(db, item, dry_run=dry_run)
+            result = process_youmind_item(writer, item, dry_run=dry_run)
             stats["processed"] += 1
 
             # 记录 Twitter 处理失败的条目
@@ -528,7 +540,10 @@ def run_import(limit: int = None, dry_run: bool = False, force_refresh: bool = F
                 processed_ids.add(item_id)
                 # 每处理 10 条保存一次进度，减少 IO
                 if i % 10 == 0 or i == total_items:
-                    save_progress({"processed_ids": list(processed_ids)})
+                    writer.flush()
+                    # 进度时间戳每 PROGRESS_TIMESTAMP_INTERVAL 秒才刷新一次，最后一次保存时取当前时间
+                    max_age = 0 if i == total_items else PROGRESS_TIMESTAMP_INTERVAL
+                    save_progress({"processed_ids": processed_ids}, now_iso(max_age))
 
             # 定期刷新失败文件（每 FLUSH_INTERVAL 条或最后一条）
             if not dry_run and failed_twitter_items and (i % FLUSH_INTERVAL == 0 or i == total_items):
@@ -551,6 +566,8 @@ def run_import(limit: int = None, dry_run: bool = False, force_refresh: bool = F
         print(f"⏭️ 跳过: {stats['skipped']}")
         print(f"❌ 失败: {stats['failed']}")
         print(f"⚠️ Twitter 处理失败: {stats['twitter_failed']}")
+        if writer.failed:
+            print(f"💾 批量写入失败: {writer.failed}")
 
         if failed_items:
             print("\n" + "=" * 70)
@@ -576,6 +593,8 @@ def run_import(limit: int = None, dry_run: bool = False, force_refresh: bool = F
         print("\n" + "=" * 70)
 
     finally:
+        # 写入缓冲区剩余记录 (包括中断时)
+        writer.flush()
         db.close()
 
 
@@ -20,9 +20,12 @@ Muse Worker - 一体化邮件监听 + Twitter 抓取 + 数据库写入
 import argparse
 import email
 import imaplib
+import io
 import os
 import re
 import sys
+import threading
+import time
 from datetime import datetime, timezone
 from email.header import decode_header
 from email.message import Message
@@ -56,7 +59,7 @@ from prompt_utils import process_tweet_for_import
 # 数据库连接
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import RealDictCursor, execute_values
 except ImportError:
     print("❌ 请安装 psycopg2: pip install psycopg2-binary")
     sys.exit(1)
@@ -72,6 +75,21 @@ AI_MODEL = os.environ.get("AI_MODEL", "openai")
 
 # ========== 数据库操作 ==========
 
+PROMPT_COLUMNS = ("title", "prompt", "category", "tags", "images", "source_link", "author", "import_source")
+
+
+def _copy_field(value) -> str:
+    """把一个值转成 COPY text 格式的字段 (NULL 为 \\N，列表转为数组字面量)"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (list, tuple)):
+        value = "{" + ",".join(
+            '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"' for v in value
+        ) + "}"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
 class Database:
     def __init__(self, connection_string: str):
         self.connection_string = connection_string
@@ -151,6 +169,188 @@ class Database:
             """,
             (title, prompt, category, tags or [], images or [], source_link, author, import_source)
         )
+    
+    def load_source_links(self) -> set:
+        """一次读取全部 source_link，用于在内存中查重"""
+        conn = self.connect()
+        with conn.cursor() as cur:
+            cur.execute("SELECT source_link FROM prompts WHERE source_link IS NOT NULL")
+            return {row[0] for row in cur}
+    
+    def save_prompts_bulk(self, rows: List[Dict]) -> int:
+        """批量写入 prompts (一条多行 INSERT)，rows 的字段与 save_prompt 参数一致，返回写入行数"""
+        if not rows:
+            return 0
+        values = [
+            (r["title"], r["prompt"], r["category"], r.get("tags") or [], r.get("images") or [],
+             r["source_link"], r.get("author"), r.get("import_source"))
+            for r in rows
+        ]
+        conn = self.connect()
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                """
+                INSERT INTO prompts (title, prompt, category, tags, images, source_link, author, import_source)
+                VALUES %s
+                """,
+                values,
+                page_size=len(values)
+            )
+            inserted = cur.rowcount
+        conn.commit()
+        return inserted
+    
+    def copy_prompts(self, rows: List[Dict]) -> int:
+        """
+        大批量写入 prompts: COPY 到临时表，再插入 source_link 尚不存在的记录，返回写入行数
+        比多行 INSERT 少了 SQL 解析开销，适合全量回填
+        """
+        if not rows:
+            return 0
+        buf = io.StringIO()
+        for r in rows:
+            values = (r["title"], r["prompt"], r["category"], r.get("tags") or [], r.get("images") or [],
+                      r["source_link"], r.get("author"), r.get("import_source"))
+            buf.write("\t".join(_copy_field(v) for v in values) + "\n")
+        buf.seek(0)
+
+        columns = ", ".join(PROMPT_COLUMNS)
+        conn = self.connect()
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TEMP TABLE prompts_copy ON COMMIT DROP AS SELECT {columns} FROM prompts WITH NO DATA")
+            cur.copy_expert(f"COPY prompts_copy ({columns}) FROM STDIN WITH (FORMAT text)", buf)
+            cur.execute(
+                f"""
+                INSERT INTO prompts ({columns})
+                SELECT {columns} FROM prompts_copy c
+                WHERE NOT EXISTS (SELECT 1 FROM prompts p WHERE p.source_link = c.source_link)
+                """
+            )
+            inserted = cur.rowcount
+        conn.commit()
+        return inserted
+
+
+class BufferedPromptWriter:
+    """
+    缓冲写入器: save_prompt 只把记录放入缓冲区，攒够 batch_size 条或超过 flush_interval 秒
+    后用 Database.save_prompts_bulk 一次写入。
+
+    提供与 Database 相同的 prompt_exists/save_prompt 接口，可直接传给 process_tweet_for_import；
+    可在多个线程中调用。用完后需调用 flush() 写入剩余记录。
+    调用 preload_existing() 后 prompt_exists 只查内存，不再逐条查询数据库。
+    auto_flush=False 时 save_prompt 从不写库，由调用方根据 due() 自行调用 flush()。
+    use_copy=True 时用 Database.copy_prompts (COPY) 写入，适合大批量回填。
+    调用方需要在写库成功后才记录进度时，用 is_pending()/failed_links 判断某条记录的写入结果。
+    """
+    
+    def __init__(self, db: Database, batch_size: int = 50, flush_interval: float = 2.0,
+                 auto_flush: bool = True, use_copy: bool = False):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.auto_flush = auto_flush
+        self.use_copy = use_copy
+        self.saved = 0
+        self.failed = 0
+        self.failed_links = set()
+        self._buffer: List[Dict] = []
+        self._pending_links = set()
+        self._known_links: Optional[set] = None
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+    
+    def preload_existing(self) -> int:
+        """预加载数据库中已有的 source_link，返回条数"""
+        links = self.db.load_source_links()
+        with self._lock:
+            self._known_links = links
+        return len(links)
+    
+    def prompt_exists(self, source_link: str) -> bool:
+        with self._lock:
+            if source_link in self._pending_links:
+                return True
+            if self._known_links is not None:
+                return source_link in self._known_links
+        return self.db.prompt_exists(source_link)
+    
+    def save_prompt(self, title: str, prompt: str, category: str,
+                    tags: List[str], images: List[str], source_link: str,
+                    author: str = None, import_source: str = None) -> Optional[Dict]:
+        row = {
+            "title": title, "prompt": prompt, "category": category,
+            "tags": tags, "images": images, "source_link": source_link,
+            "author": author, "import_source": import_source,
+        }
+        with self._lock:
+            self._buffer.append(row)
+            self._pending_links.add(source_link)
+        if self.auto_flush and self.due():
+            self.flush()
+        return row
+    
+    def is_pending(self, source_link: str) -> bool:
+        """记录是否还在缓冲区中或正在写入"""
+        with self._lock:
+            return source_link in self._pending_links
+    
+    def due(self) -> bool:
+        """缓冲区是否已满或距上次写入超过 flush_interval 秒"""
+        with self._lock:
+            return bool(self._buffer) and (
+                len(self._buffer) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+    
+    def flush(self) -> int:
+        """写入缓冲区中的记录，返回写入行数"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not rows:
+            return 0
+        failed = 0
+        saved_links = []
+        try:
+            if self.use_copy:
+                inserted = self.db.copy_prompts(rows)
+            else:
+                inserted = self.db.save_prompts_bulk(rows)
+            saved_links = [r["source_link"] for r in rows]
+        except Exception as e:
+            # 一条坏数据会让整批失败，回滚后逐条写入
+            print(f"⚠️ 批量写入失败，逐条重试 ({len(rows)} 条): {e}")
+            self._rollback()
+            inserted = 0
+            for row in rows:
+                try:
+                    self.db.save_prompt(**row)
+                    inserted += 1
+                    saved_links.append(row["source_link"])
+                except Exception as row_error:
+                    self._rollback()
+                    failed += 1
+                    print(f"❌ 保存失败 {row['source_link']}: {row_error}")
+        finally:
+            # 未确认写入的记录 (包括中途中断时) 都算失败
+            saved = set(saved_links)
+            with self._lock:
+                self.failed_links.update(r["source_link"] for r in rows if r["source_link"] not in saved)
+                self._pending_links.difference_update(r["source_link"] for r in rows)
+                if self._known_links is not None:
+                    self._known_links.update(saved_links)
+        with self._lock:
+            self.saved += inserted
+            self.failed += failed
+        return inserted
+    
+    def _rollback(self):
+        try:
+            self.db.conn.rollback()
+        except Exception:
+            pass
 
 
 # ========== Gmail 操作 ==========
@@ -251,7 +451,7 @@ def extract_twitter_links(text: str) -> List[str]:
     direct_urls = re.findall(url_pattern, text)
     
     for url in direct_urls:
-        normalized = url.replace("twitter.com", "x.com")
+        normalized = url.replace("twitter.com", "x.com", 1)
         if normalized not in twitter_urls:
             twitter_urls.append(normalized)
     
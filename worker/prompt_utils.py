@@ -17,16 +17,29 @@ Prompt Utils - 提示词提取和分类工具
     classification = classify_prompt(prompt, model="openai")
 """
 
+import asyncio
+import contextlib
+import hashlib
 import json
 import os
 import re
 import subprocess
 import sys
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 import requests
 
+# orjson (可选，更快的 JSON 序列化)
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # 加载环境变量
 try:
     from dotenv import load_dotenv
@@ -59,6 +72,243 @@ GITEE_AI_MODEL = "DeepSeek-V3"
 GITEE_AI_API_KEY = os.environ.get("GITEE_AI_API_KEY", "")
 
 
+# ========== JSON 读写 ==========
+
+def json_dumps_bytes(obj, indent: bool = False, default: Callable = None) -> bytes:
+    """序列化为 UTF-8 JSON (优先 orjson，未安装时回退到标准库)"""
+    if HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, default=default).encode("utf-8")
+
+
+def json_loads(data):
+    """解析 JSON 字节串或字符串 (优先 orjson)"""
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+
+# ========== 时间戳 ==========
+
+_now_iso_cache = ("", 0.0)
+
+
+def now_iso(max_age: float = 1.0) -> str:
+    """
+    当前 UTC 时间的 ISO 字符串 (进度/失败记录用)
+    距上次生成不超过 max_age 秒时直接返回缓存值，max_age=0 时总是重新生成
+    """
+    global _now_iso_cache
+    value, stamp = _now_iso_cache
+    now = time.monotonic()
+    if not value or now - stamp > max_age:
+        value = datetime.now(timezone.utc).isoformat()
+        _now_iso_cache = (value, now)
+    return value
+
+
+# ========== 线程输出前缀 ==========
+# 多线程处理条目时，工作线程中 prepare/finalize 等函数的输出会与其它条目交错，
+# 用 thread_log_prefix 给本线程的每行输出加上条目标识
+
+_log_local = threading.local()
+
+
+class _ThreadPrefixedStream:
+    """stdout 包装: 设置了前缀的线程按整行加前缀写出 (不完整的行先缓存)，其它线程原样写出"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text: str) -> int:
+        prefix = getattr(_log_local, "prefix", None)
+        if not prefix:
+            return self._stream.write(text)
+        pending = _log_local.pending + text
+        lines = pending.split("\n")
+        _log_local.pending = lines.pop()
+        if lines:
+            self._stream.write("".join(f"{prefix}{line}\n" for line in lines))
+        return len(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+@contextlib.contextmanager
+def thread_prefixed_output():
+    """在此范围内 sys.stdout 支持按线程加前缀 (配合 thread_log_prefix 使用)"""
+    original = sys.stdout
+    sys.stdout = _ThreadPrefixedStream(original)
+    try:
+        yield
+    finally:
+        sys.stdout = original
+
+
+@contextlib.contextmanager
+def thread_log_prefix(prefix: str):
+    """本线程在此范围内的每行输出都以 prefix 开头 (需在 thread_prefixed_output 范围内)"""
+    _log_local.prefix, _log_local.pending = prefix, ""
+    try:
+        yield
+    finally:
+        pending, _log_local.prefix = _log_local.pending, None
+        if pending:
+            print(f"{prefix}{pending}")
+
+
+# ========== 结果缓存 ==========
+
+# fetch_tweet / classify_prompt 结果的磁盘缓存目录，由导入脚本通过 set_result_cache_dir 启用
+_RESULT_CACHE_DIR: Optional[Path] = None
+
+
+def set_result_cache_dir(cache_dir: Optional[Path]):
+    """启用 (传入目录) 或禁用 (传入 None) 结果磁盘缓存"""
+    global _RESULT_CACHE_DIR
+    _RESULT_CACHE_DIR = Path(cache_dir) if cache_dir else None
+
+
+def _cache_path(namespace: str, key: str) -> Path:
+    return _RESULT_CACHE_DIR / namespace / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+
+def cache_get(namespace: str, key: str, max_age: Optional[float] = None) -> Optional[dict]:
+    """读取缓存，未启用缓存、未命中或超过 max_age 秒时返回 None"""
+    if _RESULT_CACHE_DIR is None:
+        return None
+    path = _cache_path(namespace, key)
+    if path.exists():
+        try:
+            if max_age is not None and time.time() - path.stat().st_mtime > max_age:
+                return None
+            return json_loads(path.read_bytes())
+        except Exception:
+            pass  # 缓存损坏时重新获取
+    return None
+
+
+def cache_put(namespace: str, key: str, value: Optional[dict]):
+    """通过临时文件 + os.replace 原子写入缓存，空结果不缓存"""
+    if _RESULT_CACHE_DIR is None or not value:
+        return
+    path = _cache_path(namespace, key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(json_dumps_bytes(value, default=str))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"   ⚠️ 写入缓存失败: {e}")
+
+
+def write_json_atomic(path: Path, data, default: Callable = None) -> None:
+    """
+    写入 JSON 文件: 先写临时文件并 fsync，再 os.replace 覆盖
+    中途崩溃时原文件保持完整，不会留下被截断的空文件
+    default 用于序列化非 JSON 类型 (如 default=list 直接写入 set)
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(json_dumps_bytes(data, indent=True, default=default))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+class FailedItemsLog:
+    """失败记录，每条立即追加到 JSONL 文件 (首次失败时才创建文件)"""
+
+    def __init__(self, path: Path, enabled: bool = True, dumps: Callable[[dict], bytes] = None):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.count = 0
+        self._dumps = dumps or json_dumps_bytes
+        self._file = None
+
+    def append(self, record: dict):
+        self.count += 1
+        if not self.enabled:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "ab")
+        self._file.write(self._dumps(record) + b"\n")
+        self._file.flush()
+
+    def close(self) -> Optional[Path]:
+        """关闭文件，返回失败记录路径 (没有写入时返回 None)"""
+        if self._file is None:
+            return None
+        self._file.close()
+        return self.path
+
+
+# ========== 导入流水线 (asyncio) ==========
+# 导入脚本共用的后台阶段: 已处理 ID 攒批写入、缓冲写入器定期写库
+
+
+def _take_batch(queue: asyncio.Queue, batch: list, batch_size: int) -> list:
+    while not queue.empty() and len(batch) < batch_size:
+        batch.append(queue.get_nowait())
+    return batch
+
+
+async def batch_queue_stage(queue: asyncio.Queue, sink: Callable[[list], None], batch_size: int = 50):
+    """
+    后台任务: 等待队列中的元素，连同已排队的 (最多 batch_size 条) 一次交给 sink
+    任务取消后需调用 drain_queue 写入剩余元素
+    """
+    while True:
+        sink(_take_batch(queue, [await queue.get()], batch_size))
+
+
+def drain_queue(queue: asyncio.Queue, sink: Callable[[list], None], batch_size: int = 50):
+    """按 batch_size 分批写入队列中剩余的元素"""
+    while not queue.empty():
+        sink(_take_batch(queue, [], batch_size))
+
+
+async def writer_flush_stage(writer, interval: float, executor=None,
+                             on_flush: Optional[Callable[[], None]] = None):
+    """
+    后台任务: 每 interval 秒检查一次 BufferedPromptWriter，到期时在线程池 executor 中写库
+
+    on_flush 在每次检查后于事件循环线程中调用，供调用方在记录写库成功后再保存进度。
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        if writer.due():
+            await loop.run_in_executor(executor, writer.flush)
+        if on_flush is not None:
+            on_flush()
+
+
+def cached_json(namespace: str, key: str, fn: Callable[[], Optional[dict]],
+                valid: Optional[Callable[[dict], bool]] = None) -> Optional[dict]:
+    """
+    带磁盘缓存的调用: <cache_dir>/<namespace>/<sha1(key)>.json
+
+    命中时直接返回缓存内容，否则调用 fn() 并写入缓存。
+    空结果和异常不缓存，下次仍会重试；给出 valid 时不满足条件的结果也不缓存 (已缓存的视为未命中)。
+    """
+    cached = cache_get(namespace, key)
+    if cached is not None and (valid is None or valid(cached)):
+        return cached
+
+    value = fn()
+    if value and (valid is None or valid(value)):
+        cache_put(namespace, key, value)
+    return value
+
+
 # ========== AI 调用 ==========
 
 def call_ai(messages: list, model: str = DEFAULT_MODEL) -> str:
@@ -444,6 +694,8 @@ PROMPT_IN_REPLY_PATTERNS = [
     # 文末带向下箭头表示内容在下方（即使不紧跟 prompt 关键词）
     r'[👇⬇️↓🔽⤵️]\s*$',
 ]
+# 合并为一个预编译正则，每条文本只扫描一次
+PROMPT_IN_REPLY_RE = re.compile("|".join(f"(?:{p})" for p in PROMPT_IN_REPLY_PATTERNS), re.IGNORECASE)
 
 
 def detect_prompt_in_reply(text: str) -> bool:
@@ -459,13 +711,7 @@ def detect_prompt_in_reply(text: str) -> bool:
     if not text:
         return False
 
-    text_lower = text.lower()
-
-    for pattern in PROMPT_IN_REPLY_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return True
-
-    return False
+    return PROMPT_IN_REPLY_RE.search(text) is not None
 
 
 # 检测 "prompt 在 ALT 文本中" 的指示符模式
@@ -478,6 +724,7 @@ PROMPT_IN_ALT_PATTERNS = [
     r'提示词在\s*alt',
     r'alt\s*里',
 ]
+PROMPT_IN_ALT_RE = re.compile("|".join(f"(?:{p})" for p in PROMPT_IN_ALT_PATTERNS), re.IGNORECASE)
 
 
 def detect_prompt_in_alt(text: str) -> bool:
@@ -493,13 +740,7 @@ def detect_prompt_in_alt(text: str) -> bool:
     if not text:
         return False
 
-    text_lower = text.lower()
-
-    for pattern in PROMPT_IN_ALT_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return True
-
-    return False
+    return PROMPT_IN_ALT_RE.search(text) is not None
 
 
 # ========== 提示词提取 ==========
@@ -1076,25 +1317,10 @@ def classify_prompt(prompt: str, model: str = DEFAULT_MODEL) -> dict:
             "reason": "原因"
         }
     """
-    categories_str = "\n".join([f"- {cat}" for cat in PROMPT_CATEGORIES])
-
     messages = [
         {
             "role": "system",
-            "content": f"""You are an AI image prompt classifier. Analyze the given prompt and classify it into one of the following categories:
-
-{categories_str}
-
-Respond in JSON format with exactly these fields:
-- "title": a concise, descriptive title for this prompt in English (3-8 words, like a short headline)
-- "category": the main category (choose from the list above, use the English part only, e.g., "Portrait", "Landscape/Nature")
-- "sub_categories": array of 1-3 secondary categories in English (e.g., ["Fashion/Clothing", "Realistic Photography"])
-- "style": detected art style (e.g., "photorealistic", "anime", "oil painting", "3D render", etc.)
-- "confidence": "high", "medium", or "low"
-- "reason": brief explanation in English (1 sentence)
-
-Example response:
-{{"title": "Fashion Actress Bird's Eye View", "category": "Portrait", "sub_categories": ["Fashion/Clothing"], "style": "photorealistic", "confidence": "high", "reason": "The prompt describes a Japanese actress in a black coat from above"}}"""
+            "content": _classification_system_prompt()
         },
         {
             "role": "user",
@@ -1142,42 +1368,141 @@ Example response:
                 "reason": "Failed to parse classification result"
             }
 
-        # 标准化结果
-        normalized = {
-            "title": result.get("title", "Untitled Prompt"),
-            "category": result.get("category", "Other"),
-            "sub_categories": result.get("sub_categories", []),
-            "style": result.get("style", "unknown"),
-            "confidence": result.get("confidence", "medium"),
-            "reason": result.get("reason", ""),
-        }
+        return _normalize_classification(result)
+
+    except requests.exceptions.Timeout:
+        raise Exception("API 请求超时")
+    except Exception as e:
+        raise Exception(f"分类失败: {e}")
+
+
+def _classification_system_prompt() -> str:
+    """分类任务的系统提示词 (单条和批量分类共用)"""
+    categories_str = "\n".join([f"- {cat}" for cat in PROMPT_CATEGORIES])
+    return f"""You are an AI image prompt classifier. Analyze the given prompt and classify it into one of the following categories:
+
+{categories_str}
+
+Respond in JSON format with exactly these fields:
+- "title": a concise, descriptive title for this prompt in English (3-8 words, like a short headline)
+- "category": the main category (choose from the list above, use the English part only, e.g., "Portrait", "Landscape/Nature")
+- "sub_categories": array of 1-3 secondary categories in English (e.g., ["Fashion/Clothing", "Realistic Photography"])
+- "style": detected art style (e.g., "photorealistic", "anime", "oil painting", "3D render", etc.)
+- "confidence": "high", "medium", or "low"
+- "reason": brief explanation in English (1 sentence)
+
+Example response:
+{{"title": "Fashion Actress Bird's Eye View", "category": "Portrait", "sub_categories": ["Fashion/Clothing"], "style": "photorealistic", "confidence": "high", "reason": "The prompt describes a Japanese actress in a black coat from above"}}"""
 
-        # 确保 title 是字符串
-        if not isinstance(normalized["title"], str) or not normalized["title"].strip():
-            normalized["title"] = "Untitled Prompt"
 
-        # 确保 sub_categories 是列表
-        if not isinstance(normalized["sub_categories"], list):
-            normalized["sub_categories"] = []
+def _normalize_classification(result: dict) -> dict:
+    """标准化 AI 返回的分类结果"""
+    # 标准化结果
+    normalized = {
+        "title": result.get("title", "Untitled Prompt"),
+        "category": result.get("category", "Other"),
+        "sub_categories": result.get("sub_categories", []),
+        "style": result.get("style", "unknown"),
+        "confidence": result.get("confidence", "medium"),
+        "reason": result.get("reason", ""),
+    }
 
-        # 清理 sub_categories
-        cleaned_tags = []
-        for tag in normalized["sub_categories"]:
-            if isinstance(tag, str) and tag.strip():
-                cleaned_tags.append(tag.strip())
-        normalized["sub_categories"] = cleaned_tags
+    # 确保 title 是字符串
+    if not isinstance(normalized["title"], str) or not normalized["title"].strip():
+        normalized["title"] = "Untitled Prompt"
 
-        # 添加 style 到 tags 中
-        if normalized["style"] and normalized["style"] != "unknown":
-            if normalized["style"] not in normalized["sub_categories"]:
-                normalized["sub_categories"].append(normalized["style"])
+    # 确保 sub_categories 是列表
+    if not isinstance(normalized["sub_categories"], list):
+        normalized["sub_categories"] = []
 
-        return normalized
+    # 清理 sub_categories
+    cleaned_tags = []
+    for tag in normalized["sub_categories"]:
+        if isinstance(tag, str) and tag.strip():
+            cleaned_tags.append(tag.strip())
+    normalized["sub_categories"] = cleaned_tags
 
-    except requests.exceptions.Timeout:
-        raise Exception("API 请求超时")
-    except Exception as e:
-        raise Exception(f"分类失败: {e}")
+    # 添加 style 到 tags 中
+    if normalized["style"] and normalized["style"] != "unknown":
+        if normalized["style"] not in normalized["sub_categories"]:
+            normalized["sub_categories"].append(normalized["style"])
+
+    return normalized
+
+
+def _parse_json_array(text: str) -> list:
+    """从 AI 响应中解析 JSON 数组 (兼容 markdown 代码块和前后多余文本)"""
+    cleaned = text.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    elif cleaned.startswith("```"):
+        cleaned = cleaned[3:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    cleaned = cleaned.strip()
+
+    try:
+        parsed = json.loads(cleaned)
+    except json.JSONDecodeError:
+        match = re.search(r'\[.*\]', cleaned, re.DOTALL)
+        if not match:
+            raise
+        parsed = json.loads(match.group())
+
+    if not isinstance(parsed, list):
+        raise ValueError("Response is not a JSON array")
+    return parsed
+
+
+def classify_prompts_batch(prompts: list, model: str = DEFAULT_MODEL) -> list:
+    """
+    一次 AI 请求分类多条提示词
+
+    Returns:
+        与 prompts 顺序一致的分类结果列表 (格式同 classify_prompt)；
+        批量请求失败或缺少某条结果时，对缺失的条目逐条调用 classify_prompt，仍失败则为空字典
+    """
+    if not prompts:
+        return []
+
+    results = [None] * len(prompts)
+
+    if len(prompts) > 1:
+        messages = [
+            {
+                "role": "system",
+                "content": _classification_system_prompt() + """
+
+You will receive a JSON array of {"id": number, "prompt": string} objects.
+Respond with a JSON array containing one object per input, each with the input "id" plus the fields above."""
+            },
+            {
+                "role": "user",
+                "content": "Classify these AI image generation prompts:\n\n" + json.dumps(
+                    [{"id": i, "prompt": prompt} for i, prompt in enumerate(prompts)],
+                    ensure_ascii=False
+                )
+            }
+        ]
+        try:
+            for item in _parse_json_array(call_ai(messages, model)):
+                if not isinstance(item, dict):
+                    continue
+                idx = item.get("id")
+                if isinstance(idx, int) and 0 <= idx < len(prompts) and results[idx] is None:
+                    results[idx] = _normalize_classification(item)
+        except Exception as e:
+            print(f"⚠️ 批量分类失败，改为逐条分类: {e}")
+
+    for i, prompt in enumerate(prompts):
+        if results[i] is None:
+            try:
+                results[i] = classify_prompt(prompt, model=model)
+            except Exception as e:
+                print(f"⚠️ AI 分类失败: {e}")
+                results[i] = {}
+
+    return results
 
 
 # ========== 便捷函数 ==========
@@ -1514,15 +1839,19 @@ def extract_prompt_with_replies(
 
 # ========== 统一处理函数 ==========
 
+TWEET_ID_RE = re.compile(r'/status/(\d+)')
+TWEET_USERNAME_RE = re.compile(r'(?:twitter\.com|x\.com)/([^/]+)/status')
+
+
 def extract_tweet_id(url: str) -> str:
     """从 Twitter URL 提取 tweet ID"""
-    match = re.search(r'/status/(\d+)', url)
+    match = TWEET_ID_RE.search(url)
     return match.group(1) if match else ""
 
 
 def extract_username(url: str) -> str:
     """从 Twitter URL 提取用户名"""
-    match = re.search(r'(?:twitter\.com|x\.com)/([^/]+)/status', url)
+    match = TWEET_USERNAME_RE.search(url)
     return match.group(1) if match else ""
 
 
@@ -1544,6 +1873,9 @@ def process_tweet_for_import(
     - 必须有 Twitter 图片才入库
     - 失败时返回详细错误信息供记录
 
+    依次执行 prepare_tweet_for_import -> classify_for_import -> finalize_tweet_import，
+    批量导入时调用方可以分别调用这三步，让 AI 分类与下一条的抓取并发进行。
+
     Args:
         db: Database 实例 (需要有 prompt_exists 和 save_prompt 方法)
         tweet_url: 推文 URL
@@ -1565,6 +1897,39 @@ def process_tweet_for_import(
             "data": dict or None  # 失败时返回已处理的数据供记录
         }
     """
+    result, prepared = prepare_tweet_for_import(
+        db,
+        tweet_url,
+        raw_text=raw_text,
+        raw_images=raw_images,
+        author=author,
+        ai_model=ai_model,
+        skip_twitter_fetch=skip_twitter_fetch
+    )
+    if prepared is None:
+        return result
+
+    classification = classify_for_import(prepared["prompt"], ai_model=ai_model)
+    return finalize_tweet_import(db, result, prepared, classification,
+                                 import_source=import_source, dry_run=dry_run)
+
+
+def prepare_tweet_for_import(
+    db,
+    tweet_url: str,
+    raw_text: str = None,
+    raw_images: list = None,
+    author: str = None,
+    ai_model: str = DEFAULT_MODEL,
+    skip_twitter_fetch: bool = False,
+) -> tuple:
+    """
+    入库第一步: 查重、获取 Twitter 图片和文本、AI 提取 prompt
+
+    Returns:
+        (result, prepared): 失败时 prepared 为 None，result 为最终结果 (格式同 process_tweet_for_import)；
+        成功时 prepared 包含 tweet_url, tweet_id, username, images, prompt
+    """
     result = {
         "success": False,
         "method": "skipped",
@@ -1576,12 +1941,12 @@ def process_tweet_for_import(
 
     if not tweet_url:
         result["error"] = "No tweet URL"
-        return result
+        return result, None
 
     # 1. 检查重复
     if db.prompt_exists(tweet_url):
         result["error"] = "Already exists"
-        return result
+        return result, None
 
     # 2. 获取图片和文本
     text = raw_text
@@ -1594,20 +1959,20 @@ def process_tweet_for_import(
             from fetch_twitter_content import fetch_tweet
             print(f"   🐦 从 Twitter 获取数据...")
 
-            twitter_result = fetch_tweet(
+            twitter_result = cached_json("tweets", tweet_url, lambda: fetch_tweet(
                 tweet_url,
                 download_images=False,
                 extract_prompt=False,  # 我们自己用 extract_prompt_with_replies
                 ai_model=ai_model,
                 detect_ads=True
-            )
+            ), valid=lambda tweet: bool(tweet.get("images")))  # 没有图片多为临时失败，不缓存
 
             if not twitter_result:
                 result["method"] = "twitter_failed"
                 result["twitter_failed"] = True
                 result["twitter_error"] = "fetch_tweet returned None"
                 result["error"] = result["twitter_error"]
-                return result
+                return result, None
 
             # 获取图片
             twitter_images = twitter_result.get("images", [])
@@ -1616,7 +1981,7 @@ def process_tweet_for_import(
                 result["twitter_failed"] = True
                 result["twitter_error"] = "No images from Twitter"
                 result["error"] = result["twitter_error"]
-                return result
+                return result, None
 
             images = twitter_images[:5]
             print(f"   ✅ 获取到 {len(images)} 张图片")
@@ -1633,13 +1998,13 @@ def process_tweet_for_import(
             result["twitter_failed"] = True
             result["twitter_error"] = str(e)
             result["error"] = str(e)
-            return result
+            return result, None
 
     # 3. 广告检测
     if is_advertisement:
         result["error"] = "Advertisement content detected"
         print(f"   🚫 检测到广告内容，跳过")
-        return result
+        return result, None
 
     # 4. 检查图片
     if not images:
@@ -1647,12 +2012,12 @@ def process_tweet_for_import(
         result["twitter_failed"] = True
         result["twitter_error"] = "No images available"
         result["error"] = "No images available"
-        return result
+        return result, None
 
     # 5. 提取 Prompt（支持从评论获取）
     if not text:
         result["error"] = "No text content"
-        return result
+        return result, None
 
     tweet_id = extract_tweet_id(tweet_url)
     username = author or extract_username(tweet_url)
@@ -1674,7 +2039,7 @@ def process_tweet_for_import(
             print(f"   ⚠️ {error}")
         else:
             print(f"   ⚠️ AI 提取失败: {error}")
-        return result
+        return result, None
 
     extracted_prompt = extract_result["prompt"]
     from_reply = extract_result.get("from_reply", False)
@@ -1688,15 +2053,61 @@ def process_tweet_for_import(
     if len(extracted_prompt.strip()) < 20:
         result["error"] = f"Prompt too short ({len(extracted_prompt)} chars)"
         print(f"   ⚠️ Prompt 太短，跳过")
-        return result
+        return result, None
+
+    prepared = {
+        "tweet_url": tweet_url,
+        "tweet_id": tweet_id,
+        "username": username,
+        "images": images,
+        "prompt": extracted_prompt,
+    }
+    return result, prepared
 
-    # 6. AI 分类
+
+def classify_for_import(prompt: str, ai_model: str = DEFAULT_MODEL) -> dict:
+    """入库第二步: AI 分类 (失败时返回空字典，由 finalize_tweet_import 使用默认值)"""
     print(f"   🤖 AI 分类...")
     try:
-        classification = classify_prompt(extracted_prompt, model=ai_model)
+        return cached_json(
+            "classify", f"{ai_model}\n{prompt}",
+            lambda: classify_prompt(prompt, model=ai_model)
+        ) or {}
     except Exception as e:
         print(f"   ⚠️ AI 分类失败: {e}")
-        classification = {}
+        return {}
+
+
+def classify_for_import_batch(prompts: list, ai_model: str = DEFAULT_MODEL) -> list:
+    """入库第二步的批量版本: 先查缓存，未命中的提示词合并为一次 AI 请求"""
+    keys = [f"{ai_model}\n{prompt}" for prompt in prompts]
+    results = [cache_get("classify", key) for key in keys]
+
+    missing = [i for i, cached in enumerate(results) if cached is None]
+    if missing:
+        print(f"   🤖 AI 批量分类 {len(missing)} 条...")
+        classified = classify_prompts_batch([prompts[i] for i in missing], model=ai_model)
+        for i, classification in zip(missing, classified):
+            results[i] = classification
+            cache_put("classify", keys[i], classification)
+
+    return [r or {} for r in results]
+
+
+def finalize_tweet_import(
+    db,
+    result: dict,
+    prepared: dict,
+    classification: dict,
+    import_source: str = "unknown",
+    dry_run: bool = False,
+) -> dict:
+    """入库第三步: 根据分类结果整理标题/分类/标签并写入数据库"""
+    tweet_url = prepared["tweet_url"]
+    tweet_id = prepared["tweet_id"]
+    username = prepared["username"]
+    images = prepared["images"]
+    extracted_prompt = prepared["prompt"]
 
     # 准备数据
     title = classification.get("title", "").strip()
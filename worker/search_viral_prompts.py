@@ -384,8 +384,7 @@ class TwikitSearcher:
                             if hasattr(media, 'media_url') and media.media_url:
                                 img_url = media.media_url
                                 # 确保使用 https
-                                if img_url.startswith('http://'):
-                                    img_url = img_url.replace('http://', 'https://')
+                                img_url = 'https://' + img_url[7:] if img_url.startswith('http://') else img_url
                                 tweet_data["images"].append(img_url)
                             elif hasattr(media, 'media_url_https') and media.media_url_https:
                                 tweet_data["images"].append(media.media_url_https)